@@ -3,7 +3,6 @@
 Extract first gene symbols from each cell sentence in the dataset.
 """
 
-import polars as pl
 from pathlib import Path
 from typing import List
 import typer
@@ -37,28 +36,23 @@ def extract_first_genes(
     Cell sentences are space-separated lists of gene symbols ordered by descending expression level.
     This function extracts the first (highest expressed) gene from each sentence.
     """
+    # Imported here so `--help` does not pay for loading Polars
+    import polars as pl
     
-    # Read the parquet file
-    df = pl.read_parquet(input_path)
+    # Only the cell_sentence column is decoded; every other column is skipped at read time
+    df = pl.read_parquet(input_path, columns=["cell_sentence"])
     
-    # Extract first gene from each cell_sentence
-    first_genes = (
-        df.select(
-            pl.col("cell_sentence")
-            .str.split(" ")
-            .list.first()
-            .alias("first_gene")
-        )
-        .get_column("first_gene")
-        .to_list()
-    )
-    
-    # Remove None values if any
-    first_genes = [gene for gene in first_genes if gene is not None]
+    # Extract first gene from each cell_sentence, dropping nulls before leaving Arrow memory
+    first_series = df.select(
+        pl.col("cell_sentence")
+        .str.extract(r"^([^ ]+)", 1)
+        .drop_nulls()
+        .alias("first_gene")
+    ).to_series()
     
-    # Get unique genes and count
-    unique_genes = list(set(first_genes))
-    unique_genes.sort()
+    # Unique + sort run in Polars' hash/sort kernels, Python lists are only built for output
+    unique_genes = first_series.unique().sort().to_list()
+    first_genes = first_series.to_list()
     
     typer.echo(f"\nTotal cell sentences: {len(first_genes)}")
     typer.echo(f"Unique first genes: {len(unique_genes)}")
@@ -70,7 +64,7 @@ def extract_first_genes(
             typer.echo(gene)
             
     elif output_format == "json":
-        import json
+        import orjson
         output_data = {
             "total_sentences": len(first_genes),
             "unique_genes_count": len(unique_genes),
@@ -79,11 +73,11 @@ def extract_first_genes(
         }
         
         if output_file:
-            with open(output_file, 'w') as f:
-                json.dump(output_data, f, indent=2)
+            with open(output_file, 'wb') as f:
+                f.write(orjson.dumps(output_data, option=orjson.OPT_INDENT_2))
             typer.echo(f"\nSaved to {output_file}")
         else:
-            typer.echo(json.dumps(output_data, indent=2))
+            typer.echo(orjson.dumps(output_data, option=orjson.OPT_INDENT_2).decode())
             
     elif output_format == "txt":
         if output_file:
@@ -3,25 +3,55 @@
 Filter cell sentences dataset to include only cells with sentences starting with OpenGenes gene symbols.
 """
 
-import sqlite3
 from pathlib import Path
-from typing import Set
+from typing import AbstractSet, FrozenSet, List, Optional
 
-import polars as pl
-from eliot import start_action, to_file
-from huggingface_hub import hf_hub_download
-from pycomfort.logging import to_nice_file, to_nice_stdout
 import typer
 
 app = typer.Typer(help="Filter cell sentences by OpenGenes gene symbols")
 
+# Rows per output row group; the filter is highly selective, so without a fixed size the writer flushes tiny row groups
+DEFAULT_ROW_GROUP_SIZE = 100_000
+
 # OpenGenes database configuration
 HF_REPO_ID = "longevity-genie/bio-mcp-data"
 HF_SUBFOLDER = "opengenes"
 
+# Local cache of the OpenGenes symbol set so repeated runs skip SQLite entirely
+OPENGENES_CACHE_DIR = Path.home() / ".cache" / "cell2sentence4longevity"
+
+
+def _read_symbol_cache(cache_path: Path) -> Optional[FrozenSet[str]]:
+    """Load cached OpenGenes symbols, or None if the cache is missing or unreadable (e.g. truncated)."""
+    import pickle
+    
+    try:
+        with open(cache_path, "rb") as f:
+            return pickle.load(f)
+    except (pickle.UnpicklingError, EOFError, OSError):
+        return None
+
+
+def _write_symbol_cache(cache_path: Path, genes: FrozenSet[str]) -> None:
+    """Write the symbol cache to a temp file and rename it into place, so interrupted runs never leave a partial pickle."""
+    import os
+    import pickle
+    import tempfile
+    
+    # The temp file must live in the cache directory itself for os.replace to be an atomic rename
+    cache_path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=cache_path.parent, suffix=".tmp")
+    with os.fdopen(fd, "wb") as f:
+        pickle.dump(genes, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, cache_path)
 
-def get_opengenes_gene_symbols() -> Set[str]:
-    """Get all unique gene symbols from OpenGenes database."""
+
+def get_opengenes_gene_symbols() -> FrozenSet[str]:
+    """Get all unique gene symbols from OpenGenes database, cached on disk per downloaded file version."""
+    import sqlite3
+    from eliot import start_action
+    from huggingface_hub import hf_hub_download
+    
     with start_action(action_type="get_opengenes_gene_symbols") as action:
         try:
             # Download the database from Hugging Face Hub
@@ -33,89 +63,127 @@ def get_opengenes_gene_symbols() -> Set[str]:
                 cache_dir=None
             )
             
+            # A new database version changes size/mtime, which invalidates the cached symbols
+            stat = Path(db_path).stat()
+            cache_path = OPENGENES_CACHE_DIR / f"opengenes_symbols-{stat.st_size}-{int(stat.st_mtime)}.pkl"
+            cached_genes = _read_symbol_cache(cache_path)
+            if cached_genes is not None:
+                action.add_success_fields(gene_count=len(cached_genes), cache_hit=True)
+                return cached_genes
+            
             # Query for all unique gene symbols
             readonly_uri = f"file:{db_path}?mode=ro"
             with sqlite3.connect(readonly_uri, uri=True) as conn:
-                cursor = conn.cursor()
-                cursor.execute('SELECT DISTINCT HGNC FROM gene_criteria')
-                genes = {row[0] for row in cursor.fetchall()}
+                # Memory-map the read-only file instead of copying B-tree pages into userspace
+                conn.execute("PRAGMA query_only=1")
+                conn.execute("PRAGMA mmap_size=268435456")
+                cursor = conn.execute('SELECT DISTINCT HGNC FROM gene_criteria')
+                genes = frozenset(row[0] for row in cursor)
             
-            action.add_success_fields(gene_count=len(genes))
+            _write_symbol_cache(cache_path, genes)
+            
+            action.add_success_fields(gene_count=len(genes), cache_hit=False)
             return genes
         except Exception as e:
             action.add_error_fields(error=str(e), error_type=type(e).__name__)
             raise
 
 
+def count_parquet_rows(path: Path) -> int:
+    """Count rows of a parquet file or directory from the footers only, without decoding column data."""
+    import pyarrow.parquet as pq
+    
+    files = sorted(path.rglob("*.parquet")) if path.is_dir() else [path]
+    return sum(pq.ParquetFile(file).metadata.num_rows for file in files)
+
+
 def filter_cells_by_gene_symbols(
     input_path: Path,
     output_path: Path,
-    gene_symbols: Set[str],
-    lazy: bool = True
-) -> pl.DataFrame:
+    gene_symbols: AbstractSet[str],
+    lazy: bool = True,
+    columns: Optional[List[str]] = None,
+    compression: str = "uncompressed",
+    compression_level: Optional[int] = None,
+    chunk_size: int = DEFAULT_ROW_GROUP_SIZE,
+    partition_by: Optional[List[str]] = None
+) -> int:
     """
     Filter cells to keep only those with sentences starting with OpenGenes gene symbols.
     
     Args:
         input_path: Path to input parquet file or directory
-        output_path: Path to output parquet file
+        output_path: Path to output parquet file (a directory when partition_by is set)
         gene_symbols: Set of gene symbols to filter by
-        lazy: Use lazy evaluation for memory efficiency
+        lazy: Kept for backwards compatibility; the filter always streams from scan_parquet to sink_parquet
+        columns: Columns to keep in the output (all columns if None); dropped columns are never read
+        compression: Parquet compression codec for the output
+        compression_level: Compression level for codecs that support it (codec default if None)
+        chunk_size: Rows per output row group written by sink_parquet
+        partition_by: Columns to hive-partition the output by (e.g. tissue, cell_type)
         
     Returns:
-        DataFrame with filtered cells
+        Number of cells written to the output
     """
+    import polars as pl
+    from eliot import start_action
+    
     with start_action(
         action_type="filter_cells_by_gene_symbols",
         input_path=str(input_path),
         output_path=str(output_path),
         gene_count=len(gene_symbols),
-        lazy=lazy
+        lazy=lazy,
+        columns=columns,
+        compression=compression,
+        compression_level=compression_level,
+        chunk_size=chunk_size,
+        partition_by=partition_by
     ) as action:
         try:
-            # Load the dataset
-            if lazy:
-                df = pl.scan_parquet(input_path)
-            else:
-                df = pl.read_parquet(input_path)
+            # Always stream: scan lazily, projecting to the requested columns so the rest are never read
+            df = pl.scan_parquet(input_path)
+            if columns is not None:
+                df = df.select(columns)
             
-            original_count = df.select(pl.len()).collect().item() if lazy else len(df)
+            # Row counts live in the parquet footers, no need to scan any column data
+            original_count = count_parquet_rows(input_path)
             action.log(message_type="original_count", count=original_count)
             
+            # Build the membership needle once so Polars hashes it a single time per query plan
+            gene_series = pl.Series("opengenes", sorted(gene_symbols), dtype=pl.Utf8)
+            
             # Filter: extract first gene symbol from cell_sentence and check if it's in OpenGenes
             # cell_sentence format: "GENE1 GENE2 GENE3 ..."
             filtered_df = df.filter(
                 pl.col("cell_sentence")
-                .str.split(" ")
-                .list.first()
-                .is_in(list(gene_symbols))
+                .str.extract(r"^([^ ]+)", 1)
+                .is_in(gene_series.implode())
             )
             
-            if lazy:
-                # Stream to output using sink_parquet for memory efficiency
-                filtered_df.sink_parquet(
-                    output_path,
-                    compression="zstd",
-                    compression_level=3
-                )
-                # Read back to get count
-                result_df = pl.scan_parquet(output_path).collect()
-            else:
-                result_df = filtered_df
-                result_df.write_parquet(
-                    output_path,
-                    compression="zstd",
-                    compression_level=3
-                )
-            
-            filtered_count = len(result_df)
+            # Stream to output using sink_parquet on the new streaming engine for memory efficiency.
+            # The filter is highly selective, so post-filter morsels are much smaller than input ones;
+            # a fixed row group size makes the writer coalesce them instead of flushing tiny row groups.
+            # mkdir creates the hive partition directories (tissue=.../) that the partitioned sink writes into.
+            target = pl.PartitionByKey(output_path, by=partition_by) if partition_by else output_path
+            filtered_df.sink_parquet(
+                target,
+                compression=compression,
+                compression_level=compression_level,
+                row_group_size=chunk_size,
+                mkdir=True,
+                engine="streaming"
+            )
+            
+            # Count from the output footers instead of reading the written data back
+            filtered_count = count_parquet_rows(output_path)
             action.add_success_fields(
                 original_count=original_count,
                 filtered_count=filtered_count,
                 filtered_percentage=round(filtered_count / original_count * 100, 2) if original_count > 0 else 0
             )
             
-            return result_df
+            return filtered_count
             
         except Exception as e:
             action.add_error_fields(error=str(e), error_type=type(e).__name__)
@@ -136,7 +204,34 @@ def filter_dataset(
     lazy: bool = typer.Option(
         True,
         "--lazy/--eager",
-        help="Use lazy evaluation for memory efficiency"
+        help="Deprecated no-op kept for backwards compatibility: filtering always streams"
+    ),
+    columns: Optional[List[str]] = typer.Option(
+        None,
+        "--column",
+        "-c",
+        help="Column to keep in the output (repeatable, all columns by default; cell_sentence is always kept)"
+    ),
+    compression: str = typer.Option(
+        "uncompressed",
+        "--compression",
+        help="Parquet compression codec (uncompressed, snappy, lz4, zstd, ...). "
+             "Keep uncompressed for fast local scratch storage; use zstd only when writing to S3 or slow network volumes"
+    ),
+    compression_level: Optional[int] = typer.Option(
+        None,
+        "--compression-level",
+        help="Compression level for codecs that support it (e.g. 3 for zstd)"
+    ),
+    chunk_size: int = typer.Option(
+        DEFAULT_ROW_GROUP_SIZE,
+        "--chunk-size",
+        help="Rows per output row group written by sink_parquet (larger row groups amortize writer overhead)"
+    ),
+    partition_by: Optional[List[str]] = typer.Option(
+        None,
+        "--partition-by",
+        help="Column to hive-partition the output by, e.g. tissue or cell_type (repeatable; OUTPUT_PATH becomes a directory)"
     ),
     log_dir: Path = typer.Option(
         Path("./logs"),
@@ -147,6 +242,10 @@ def filter_dataset(
     """
     Filter cell sentences dataset to include only cells with sentences starting with OpenGenes gene symbols.
     """
+    import polars as pl
+    from eliot import start_action
+    from pycomfort.logging import to_nice_file, to_nice_stdout
+    
     # Setup logging
     log_dir.mkdir(parents=True, exist_ok=True)
     json_path = log_dir / "filter.json"
@@ -159,9 +258,16 @@ def filter_dataset(
         action_type="filter_dataset_main",
         input_path=str(input_path),
         output_path=str(output_path),
-        lazy=lazy
+        lazy=lazy,
+        columns=columns
     ) as action:
         try:
+            # The filter reads cell_sentence, so it is always part of the projection
+            if not columns:
+                columns = None
+            elif "cell_sentence" not in columns:
+                columns = ["cell_sentence", *columns]
+            
             # Get OpenGenes gene symbols
             gene_symbols = get_opengenes_gene_symbols()
             typer.echo(f"Loaded {len(gene_symbols)} gene symbols from OpenGenes database")
@@ -170,19 +276,24 @@ def filter_dataset(
             output_path.parent.mkdir(parents=True, exist_ok=True)
             
             # Filter cells
-            result_df = filter_cells_by_gene_symbols(
+            filtered_count = filter_cells_by_gene_symbols(
                 input_path=input_path,
                 output_path=output_path,
                 gene_symbols=gene_symbols,
-                lazy=lazy
+                lazy=lazy,
+                columns=columns,
+                compression=compression,
+                compression_level=compression_level,
+                chunk_size=chunk_size,
+                partition_by=partition_by or None
             )
             
             typer.echo(f"Filtered dataset saved to {output_path}")
-            typer.echo(f"Filtered cells: {len(result_df)}")
+            typer.echo(f"Filtered cells: {filtered_count}")
             
-            # Display sample
+            # Display sample, decoding only the first rows of the output
             typer.echo("\nSample of filtered cell sentences:")
-            sample = result_df.select("cell_sentence").head(5)
+            sample = pl.scan_parquet(output_path).select("cell_sentence").head(5).collect()
             typer.echo(sample)
             
             action.add_success_fields(success=True)
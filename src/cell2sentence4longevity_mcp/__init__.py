@@ -2,7 +2,18 @@
 
 __version__ = "0.1.0"
 
-from cell2sentence4longevity_mcp.server import Cell2SentenceMCP, AgePredictionResult
+from typing import TYPE_CHECKING, Any
+
+if TYPE_CHECKING:
+    from cell2sentence4longevity_mcp.server import Cell2SentenceMCP, AgePredictionResult
 
 __all__ = ["Cell2SentenceMCP", "AgePredictionResult"]
 
+
+def __getattr__(name: str) -> Any:
+    # The server module starts logging and builds the MCP instance on import,
+    # so only load it when its exports are actually requested (keeps the CLI startup light).
+    if name in __all__:
+        from cell2sentence4longevity_mcp import server
+        return getattr(server, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -2,15 +2,17 @@
 """CLI for Cell2Sentence4Longevity tools."""
 
 import os
-import json
+from functools import lru_cache
 from pathlib import Path
-from typing import Optional
+from types import ModuleType
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Optional, Tuple
 
+import orjson
 import typer
 from eliot import start_action
-from pycomfort.logging import to_nice_file, to_nice_stdout
 
-from cell2sentence4longevity_mcp.knockout import insilico_knockout, KnockoutResult
+if TYPE_CHECKING:
+    from cell2sentence4longevity_mcp.knockout import KnockoutResult
 
 # Configuration
 DEFAULT_VLLM_BASE_URL = os.getenv("VLLM_BASE_URL", "http://89.169.110.141:8000")
@@ -18,9 +20,43 @@ DEFAULT_MODEL = os.getenv("VLLM_MODEL", "transhumanist-already-exists/C2S-Scale-
 
 app = typer.Typer(help="Cell2Sentence4Longevity CLI tools")
 
+# Prompt line label -> (field name, value parser), dispatched with one dict lookup per line
+_PROMPT_FIELDS: Dict[str, Tuple[str, Callable[[str], Any]]] = {
+    "Sex": ("sex", str),
+    "Smoking status": ("smoking_status", int),
+    "Tissue": ("tissue", str),
+    "Cell type": ("cell_type", str),
+    "Aging related cell sentence": ("gene_sentence", str),
+}
+
+
+def _parse_prompt(prompt: str) -> Dict[str, Any]:
+    """Extract metadata and the gene sentence from a vLLM payload prompt."""
+    fields: Dict[str, Any] = {
+        "sex": None,
+        "smoking_status": None,
+        "tissue": None,
+        "cell_type": None,
+        "gene_sentence": ""
+    }
+    for line in prompt.splitlines():
+        key, sep, value = line.strip().partition(":")
+        if sep and key in _PROMPT_FIELDS:
+            name, parse = _PROMPT_FIELDS[key]
+            fields[name] = parse(value.strip())
+    return fields
+
+
+def _lazy_import() -> ModuleType:
+    """Import the knockout module on first use so `--help` does not pay for its dependencies."""
+    from cell2sentence4longevity_mcp import knockout as knockout_module
+    return knockout_module
+
 
 def setup_logging(log_dir: Optional[Path] = None) -> None:
     """Setup eliot logging to file and stdout."""
+    from pycomfort.logging import to_nice_file, to_nice_stdout
+    
     if log_dir is None:
         log_dir = Path("logs")
     
@@ -33,6 +69,77 @@ def setup_logging(log_dir: Optional[Path] = None) -> None:
     to_nice_stdout(output_file=str(json_path))
 
 
+@lru_cache(maxsize=8)
+def _load_payload_cached(path: str, mtime: float) -> Dict[str, Any]:
+    """Read and parse a payload file; keyed on mtime so edits to the file are picked up."""
+    with open(path, 'rb') as f:
+        return orjson.loads(f.read())
+
+
+def _load_payload(payload_file: Path) -> Dict[str, Any]:
+    """Load a vLLM payload JSON file (the returned dict is cached and must not be mutated)."""
+    return _load_payload_cached(str(payload_file), payload_file.stat().st_mtime)
+
+
+def _run_ko(
+    payload: Dict[str, Any],
+    fields: Dict[str, Any],
+    gene_symbol: str,
+    vllm_base_url: str,
+    model: Optional[str]
+) -> "KnockoutResult":
+    """Run a knockout for the gene sentence and metadata parsed from a payload."""
+    # Use model from command line or payload
+    model_name = model or payload.get("model", DEFAULT_MODEL)
+    
+    return _lazy_import().insilico_knockout(
+        gene_symbol=gene_symbol,
+        gene_sentence=fields["gene_sentence"],
+        vllm_base_url=vllm_base_url,
+        model=model_name,
+        sex=fields["sex"],
+        smoking_status=fields["smoking_status"],
+        tissue=fields["tissue"],
+        cell_type=fields["cell_type"],
+        max_tokens=payload.get("max_tokens", 8),
+        temperature=payload.get("temperature", 0.0),
+        top_p=payload.get("top_p", 1.0)
+    )
+
+
+def _format_result(result: "KnockoutResult", output_format: str) -> None:
+    """Print a knockout result in the requested format."""
+    if output_format == "json":
+        typer.echo(orjson.dumps(result.model_dump(), option=orjson.OPT_INDENT_2).decode())
+    elif output_format == "csv":
+        # CSV header
+        typer.echo("gene_knocked_out,age_prediction,age_prediction_with_knockout,delta_age,warning")
+        # CSV data
+        typer.echo(f"{result.gene_knocked_out},{result.age_prediction},{result.age_prediction_with_knockout},{result.delta_age},{result.warning or ''}")
+    else:  # text format
+        typer.echo(f"Gene knocked out: {result.gene_knocked_out}")
+        typer.echo(f"Age prediction (original): {result.age_prediction}")
+        typer.echo(f"Age prediction (knockout): {result.age_prediction_with_knockout}")
+        typer.echo(f"Delta age: {result.delta_age}")
+        if result.warning:
+            typer.echo(f"Warning: {result.warning}")
+
+
+def _format_results(results: List["KnockoutResult"], output_format: str) -> None:
+    """Print several knockout results in the requested format."""
+    if output_format == "json":
+        typer.echo(orjson.dumps([result.model_dump() for result in results], option=orjson.OPT_INDENT_2).decode())
+    elif output_format == "csv":
+        typer.echo("gene_knocked_out,age_prediction,age_prediction_with_knockout,delta_age,warning")
+        for result in results:
+            typer.echo(f"{result.gene_knocked_out},{result.age_prediction},{result.age_prediction_with_knockout},{result.delta_age},{result.warning or ''}")
+    else:  # text format
+        for index, result in enumerate(results):
+            if index:
+                typer.echo("")
+            _format_result(result, output_format)
+
+
 @app.command()
 def knockout(
     gene_symbol: str = typer.Argument(..., help="Gene symbol to knock out from the sentence"),
@@ -43,7 +150,7 @@ def knockout(
     cell_type: Optional[str] = typer.Option(None, "--cell-type", help="Cell type (e.g., 'CD14-low, CD16-positive monocyte')"),
     vllm_base_url: str = typer.Option(DEFAULT_VLLM_BASE_URL, "--vllm-url", help="Base URL for the vLLM API server"),
     model: str = typer.Option(DEFAULT_MODEL, "--model", help="Model name to use for prediction"),
-    max_tokens: int = typer.Option(20, "--max-tokens", help="Maximum number of tokens to generate"),
+    max_tokens: int = typer.Option(8, "--max-tokens", help="Maximum number of tokens to generate"),
     temperature: float = typer.Option(0.0, "--temperature", help="Sampling temperature"),
     top_p: float = typer.Option(1.0, "--top-p", help="Nucleus sampling parameter"),
     output_format: str = typer.Option("text", "--format", help="Output format: text, json, or csv"),
@@ -65,7 +172,7 @@ def knockout(
     setup_logging(log_dir)
     
     with start_action(action_type="cli_knockout", gene_symbol=gene_symbol, format=output_format):
-        result = insilico_knockout(
+        result = _lazy_import().insilico_knockout(
             gene_symbol=gene_symbol,
             gene_sentence=gene_sentence,
             vllm_base_url=vllm_base_url,
@@ -78,22 +185,56 @@ def knockout(
             temperature=temperature,
             top_p=top_p
         )
-        
-        # Output in the requested format
-        if output_format == "json":
-            typer.echo(result.model_dump_json(indent=2))
-        elif output_format == "csv":
-            # CSV header
-            typer.echo("gene_knocked_out,age_prediction,age_prediction_with_knockout,delta_age,warning")
-            # CSV data
-            typer.echo(f"{result.gene_knocked_out},{result.age_prediction},{result.age_prediction_with_knockout},{result.delta_age},{result.warning or ''}")
-        else:  # text format
-            typer.echo(f"Gene knocked out: {result.gene_knocked_out}")
-            typer.echo(f"Age prediction (original): {result.age_prediction}")
-            typer.echo(f"Age prediction (knockout): {result.age_prediction_with_knockout}")
-            typer.echo(f"Delta age: {result.delta_age}")
-            if result.warning:
-                typer.echo(f"Warning: {result.warning}")
+        _format_result(result, output_format)
+
+
+@app.command()
+def knockout_batch(
+    gene_sentence: str = typer.Argument(..., help="Space-separated list of gene names ordered by descending expression level"),
+    genes: Optional[List[str]] = typer.Option(None, "--gene", "-g", help="Gene symbol to knock out (repeatable, defaults to every gene in the sentence)"),
+    sex: Optional[str] = typer.Option(None, "--sex", help="Sex of the donor (e.g., 'male', 'female')"),
+    smoking_status: Optional[int] = typer.Option(None, "--smoking-status", help="Smoking status (0 = non-smoker, 1 = smoker)"),
+    tissue: Optional[str] = typer.Option(None, "--tissue", help="Tissue type (e.g., 'blood', 'brain', 'liver')"),
+    cell_type: Optional[str] = typer.Option(None, "--cell-type", help="Cell type (e.g., 'CD14-low, CD16-positive monocyte')"),
+    vllm_base_url: str = typer.Option(DEFAULT_VLLM_BASE_URL, "--vllm-url", help="Base URL for the vLLM API server"),
+    model: str = typer.Option(DEFAULT_MODEL, "--model", help="Model name to use for prediction"),
+    max_tokens: int = typer.Option(8, "--max-tokens", help="Maximum number of tokens to generate"),
+    temperature: float = typer.Option(0.0, "--temperature", help="Sampling temperature"),
+    top_p: float = typer.Option(1.0, "--top-p", help="Nucleus sampling parameter"),
+    batch_size: int = typer.Option(64, "--batch-size", help="Maximum number of prompts per vLLM request"),
+    output_format: str = typer.Option("text", "--format", help="Output format: text, json, or csv"),
+    log_dir: Optional[Path] = typer.Option(None, "--log-dir", help="Directory for log files"),
+) -> None:
+    """
+    Knock out many genes from one sentence with batched vLLM requests.
+    
+    The baseline and every knockout prompt are sent as list prompts in batches of --batch-size,
+    with the batches dispatched concurrently, instead of two sequential requests per gene.
+    
+    Example:
+        knockout-batch "MT-CO1 FTL EEF1A1 HLA-B LST1" --sex female --tissue blood
+        knockout-batch "MT-CO1 FTL EEF1A1 HLA-B LST1" -g FTL -g LST1 --format csv
+    """
+    setup_logging(log_dir)
+    
+    gene_symbols = genes or list(dict.fromkeys(gene_sentence.split()))
+    
+    with start_action(action_type="cli_knockout_batch", gene_count=len(gene_symbols), format=output_format):
+        results = _lazy_import().batch_insilico_knockout(
+            gene_symbols=gene_symbols,
+            gene_sentence=gene_sentence,
+            vllm_base_url=vllm_base_url,
+            model=model,
+            sex=sex,
+            smoking_status=smoking_status,
+            tissue=tissue,
+            cell_type=cell_type,
+            max_tokens=max_tokens,
+            temperature=temperature,
+            top_p=top_p,
+            batch_size=batch_size
+        )
+        _format_results(results, output_format)
 
 
 @app.command()
@@ -122,76 +263,19 @@ def knockout_from_payload(
     setup_logging(log_dir)
     
     with start_action(action_type="cli_knockout_from_payload", payload_file=str(payload_file)):
-        # Load payload
-        with open(payload_file, 'r') as f:
-            payload = json.load(f)
-        
-        # Extract parameters from the prompt
-        prompt = payload.get("prompt", "")
-        
-        # Parse the prompt to extract metadata and gene sentence
-        sex = None
-        smoking_status = None
-        tissue = None
-        cell_type = None
-        gene_sentence = ""
+        payload = _load_payload(payload_file)
+        fields = _parse_prompt(payload.get("prompt", ""))
         
-        for line in prompt.split('\n'):
-            line = line.strip()
-            if line.startswith("Sex:"):
-                sex = line.split(":", 1)[1].strip()
-            elif line.startswith("Smoking status:"):
-                smoking_status = int(line.split(":", 1)[1].strip())
-            elif line.startswith("Tissue:"):
-                tissue = line.split(":", 1)[1].strip()
-            elif line.startswith("Cell type:"):
-                cell_type = line.split(":", 1)[1].strip()
-            elif line.startswith("Aging related cell sentence:"):
-                gene_sentence = line.split(":", 1)[1].strip()
-        
-        if not gene_sentence:
+        if not fields["gene_sentence"]:
             raise ValueError("Could not extract gene sentence from payload prompt")
         
         # If gene_symbol is not provided, use the first gene from the sentence
         if gene_symbol is None:
-            genes = gene_sentence.split()
-            if not genes:
-                raise ValueError("Gene sentence is empty")
-            gene_symbol = genes[0]
+            gene_symbol = fields["gene_sentence"].split()[0]
             typer.echo(f"No gene symbol specified, defaulting to first gene: {gene_symbol}")
         
-        # Use model from command line or payload
-        model_name = model or payload.get("model", DEFAULT_MODEL)
-        
-        result = insilico_knockout(
-            gene_symbol=gene_symbol,
-            gene_sentence=gene_sentence,
-            vllm_base_url=vllm_base_url,
-            model=model_name,
-            sex=sex,
-            smoking_status=smoking_status,
-            tissue=tissue,
-            cell_type=cell_type,
-            max_tokens=payload.get("max_tokens", 20),
-            temperature=payload.get("temperature", 0.0),
-            top_p=payload.get("top_p", 1.0)
-        )
-        
-        # Output in the requested format
-        if output_format == "json":
-            typer.echo(result.model_dump_json(indent=2))
-        elif output_format == "csv":
-            # CSV header
-            typer.echo("gene_knocked_out,age_prediction,age_prediction_with_knockout,delta_age,warning")
-            # CSV data
-            typer.echo(f"{result.gene_knocked_out},{result.age_prediction},{result.age_prediction_with_knockout},{result.delta_age},{result.warning or ''}")
-        else:  # text format
-            typer.echo(f"Gene knocked out: {result.gene_knocked_out}")
-            typer.echo(f"Age prediction (original): {result.age_prediction}")
-            typer.echo(f"Age prediction (knockout): {result.age_prediction_with_knockout}")
-            typer.echo(f"Delta age: {result.delta_age}")
-            if result.warning:
-                typer.echo(f"Warning: {result.warning}")
+        result = _run_ko(payload, fields, gene_symbol, vllm_base_url, model)
+        _format_result(result, output_format)
 
 
 @app.command(name="ko")
@@ -222,71 +306,16 @@ def ko_short(
         raise typer.Exit(code=1)
     
     with start_action(action_type="cli_ko_short", gene_symbol=gene_symbol, payload_file=str(payload_file)):
-        # Load payload
-        with open(payload_file, 'r') as f:
-            payload = json.load(f)
+        payload = _load_payload(payload_file)
+        fields = _parse_prompt(payload.get("prompt", ""))
         
-        # Extract parameters from the prompt
-        prompt = payload.get("prompt", "")
-        
-        # Parse the prompt to extract metadata and gene sentence
-        sex = None
-        smoking_status = None
-        tissue = None
-        cell_type = None
-        gene_sentence = ""
-        
-        for line in prompt.split('\n'):
-            line = line.strip()
-            if line.startswith("Sex:"):
-                sex = line.split(":", 1)[1].strip()
-            elif line.startswith("Smoking status:"):
-                smoking_status = int(line.split(":", 1)[1].strip())
-            elif line.startswith("Tissue:"):
-                tissue = line.split(":", 1)[1].strip()
-            elif line.startswith("Cell type:"):
-                cell_type = line.split(":", 1)[1].strip()
-            elif line.startswith("Aging related cell sentence:"):
-                gene_sentence = line.split(":", 1)[1].strip()
-        
-        if not gene_sentence:
+        if not fields["gene_sentence"]:
             typer.echo("Error: Could not extract gene sentence from payload prompt", err=True)
             raise typer.Exit(code=1)
         
-        # Use model from command line or payload
-        model_name = model or payload.get("model", DEFAULT_MODEL)
-        
-        result = insilico_knockout(
-            gene_symbol=gene_symbol,
-            gene_sentence=gene_sentence,
-            vllm_base_url=vllm_base_url,
-            model=model_name,
-            sex=sex,
-            smoking_status=smoking_status,
-            tissue=tissue,
-            cell_type=cell_type,
-            max_tokens=payload.get("max_tokens", 20),
-            temperature=payload.get("temperature", 0.0),
-            top_p=payload.get("top_p", 1.0)
-        )
-        
-        # Output in the requested format
-        if output_format == "json":
-            typer.echo(result.model_dump_json(indent=2))
-        elif output_format == "csv":
-            # CSV header
-            typer.echo("gene_knocked_out,age_prediction,age_prediction_with_knockout,delta_age,warning")
-            # CSV data
-            typer.echo(f"{result.gene_knocked_out},{result.age_prediction},{result.age_prediction_with_knockout},{result.delta_age},{result.warning or ''}")
-        else:  # text format
-            typer.echo(f"Gene knocked out: {result.gene_knocked_out}")
-            typer.echo(f"Age prediction (original): {result.age_prediction}")
-            typer.echo(f"Age prediction (knockout): {result.age_prediction_with_knockout}")
-            typer.echo(f"Delta age: {result.delta_age}")
-            if result.warning:
-                typer.echo(f"Warning: {result.warning}")
+        result = _run_ko(payload, fields, gene_symbol, vllm_base_url, model)
+        _format_result(result, output_format)
 
 
 if __name__ == "__main__":
     app()
-
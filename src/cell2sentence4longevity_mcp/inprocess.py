@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""Optional in-process vLLM engine for running the model on the same host as the MCP server."""
+
+import asyncio
+import os
+import threading
+from functools import lru_cache
+from typing import Any, List, Optional, Sequence
+
+from eliot import start_action
+
+# Set VLLM_INPROCESS=1 to load the model into this process instead of calling a vLLM server over HTTP
+INPROCESS_ENABLED = os.getenv("VLLM_INPROCESS") == "1"
+DEFAULT_GPU_MEMORY_UTILIZATION = 0.8
+
+
+class InProcessBackend:
+    """Generate completions with an in-process `vllm.LLM`, skipping the HTTP and API-server layers."""
+    
+    def __init__(self, model: str, gpu_memory_utilization: float = DEFAULT_GPU_MEMORY_UTILIZATION):
+        """Load the model into a vLLM engine (vllm is an optional dependency, imported only here)."""
+        from vllm import LLM
+        
+        with start_action(action_type="load_inprocess_vllm", model=model, gpu_memory_utilization=gpu_memory_utilization):
+            self.model = model
+            self._llm = LLM(model=model, gpu_memory_utilization=gpu_memory_utilization)
+            # The synchronous LLM API is not safe to enter from several threads at once
+            self._lock = threading.Lock()
+    
+    def generate(
+        self,
+        prompts: List[str],
+        max_tokens: int,
+        temperature: float,
+        top_p: float,
+        stop: Sequence[str]
+    ) -> List[str]:
+        """
+        Generate one completion per prompt, batched by the engine.
+        
+        Args:
+            prompts: Fully built prompts
+            max_tokens: Maximum number of tokens to generate
+            temperature: Sampling temperature
+            top_p: Nucleus sampling parameter
+            stop: Stop sequences
+        
+        Returns:
+            Raw completion texts in prompt order
+        """
+        from vllm import SamplingParams
+        
+        params = SamplingParams(n=1, max_tokens=max_tokens, temperature=temperature, top_p=top_p, stop=list(stop))
+        with self._lock:
+            outputs: List[Any] = self._llm.generate(prompts, params, use_tqdm=False)
+        return [output.outputs[0].text for output in outputs]
+    
+    async def agenerate(
+        self,
+        prompts: List[str],
+        max_tokens: int,
+        temperature: float,
+        top_p: float,
+        stop: Sequence[str]
+    ) -> List[str]:
+        """Run `generate` in a worker thread so the blocking engine call does not stall the event loop."""
+        return await asyncio.to_thread(self.generate, prompts, max_tokens, temperature, top_p, stop)
+
+
+def _gpu_memory_utilization() -> float:
+    """Read VLLM_GPU_MEMORY_UTILIZATION when the engine loads, so a malformed value cannot break imports."""
+    value = os.getenv("VLLM_GPU_MEMORY_UTILIZATION")
+    if value is None:
+        return DEFAULT_GPU_MEMORY_UTILIZATION
+    try:
+        return float(value)
+    except ValueError:
+        raise ValueError(f"VLLM_GPU_MEMORY_UTILIZATION must be a number, got {value!r}") from None
+
+
+@lru_cache(maxsize=None)
+def _load_backend(model: str) -> InProcessBackend:
+    return InProcessBackend(model, gpu_memory_utilization=_gpu_memory_utilization())
+
+
+def get_inprocess_backend(model: str) -> Optional[InProcessBackend]:
+    """Return the shared in-process engine for a model, or None when VLLM_INPROCESS is not enabled."""
+    if not INPROCESS_ENABLED:
+        return None
+    return _load_backend(model)
@@ -1,10 +1,69 @@
 #!/usr/bin/env python3
 """Insilico knockout functionality for gene expression analysis."""
 
-from typing import Optional
+import asyncio
+import os
+import re
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple, Union
+import orjson
 from pydantic import BaseModel, Field
-from eliot import start_action
-import requests
+from eliot import Action, start_action
+
+from cell2sentence4longevity_mcp.inprocess import get_inprocess_backend
+from cell2sentence4longevity_mcp.vllm_client import (
+    JSON_HEADERS,
+    VLLMBatcher,
+    completions_url,
+    encode_prompt,
+    get_async_client,
+    prune_closed_loops,
+    run_sync,
+)
+
+# Raw model responses are only logged with MCP_DEBUG=1, keeping per-prediction log records small
+DEBUG = os.getenv("MCP_DEBUG") == "1"
+
+# The answer is a single number (e.g. "42.5"), which fits in a few tokens
+DEFAULT_MAX_TOKENS = 8
+
+# Maximum number of prompts sent to vLLM in a single batched completions request
+DEFAULT_BATCH_SIZE = 64
+
+# Maximum number of knockout predictions a sweep keeps in flight at once
+SWEEP_CONCURRENCY = 32
+
+# LRU of deterministic (temperature 0) predictions, so knockout sweeps over one sentence
+# compute the shared baseline once instead of once per gene
+PREDICTION_CACHE_SIZE = 4096
+_PREDICTION_CACHE: "OrderedDict[Tuple[str, str, str, int, float], float]" = OrderedDict()
+# Predictions run on several event loops (the server's and `run_sync`'s background loop), each on
+# its own thread, and OrderedDict reordering is not atomic, so every cache access holds this lock
+_PREDICTION_CACHE_LOCK = threading.Lock()
+
+# Fixed parts of the age prediction prompt the model was fine-tuned on
+_HEADER = "The following is a list of aging related gene names ordered by descending expression level in a cell.\n"
+_FOOTER = "Predict the Age of the donor from whom these cells were taken.\nAnswer only with age value in years:"
+_STOP = ("<ctrl100>", "<end_of_turn>", "<eos>")
+
+# Prompt-independent fields shared by every completions request
+_BASE_PAYLOAD: Dict[str, Any] = {"n": 1, "stop": _STOP}
+
+# Deterministic predictions on one event loop share a batcher per (url, model, max_tokens, top_p);
+# entries of closed loops are dropped by `prune_closed_loops`
+_BATCHERS: Dict[asyncio.AbstractEventLoop, Dict[Tuple[str, str, int, float], VLLMBatcher]] = {}
+
+# Server-sent event framing of streamed completions
+_SSE_DATA = "data: "
+_SSE_DONE = "[DONE]"
+
+# Runs of whitespace between genes of a sentence
+_WS = re.compile(r"\s+")
+
+# First number in a model response is the predicted age
+_AGE_RE = re.compile(r'[-+]?\d+(?:\.\d+)?')
 
 
 class KnockoutResult(BaseModel):
@@ -19,7 +78,215 @@ class KnockoutResult(BaseModel):
     warning: Optional[str] = Field(default=None, description="Warning message if gene was not found or other issues occurred")
 
 
-def predict_age_from_sentence(
+def build_prompt(
+    gene_sentence: str,
+    sex: Optional[str] = None,
+    smoking_status: Optional[int] = None,
+    tissue: Optional[str] = None,
+    cell_type: Optional[str] = None
+) -> str:
+    """Build the age prediction prompt for a gene sentence and optional metadata."""
+    # Invariant text and metadata come first and the gene sentence last, so prompts that differ
+    # only in knocked-out genes share a prefix that vLLM's prefix cache can reuse
+    metadata = "".join(
+        f"{label}: {value}\n"
+        for label, value in (
+            ("Sex", sex),
+            ("Smoking status", smoking_status),
+            ("Tissue", tissue),
+            ("Cell type", cell_type)
+        )
+        if value is not None and value != ""
+    )
+    return f"{_HEADER}\n{metadata}Aging related cell sentence: {gene_sentence}\n{_FOOTER}"
+
+
+@lru_cache(maxsize=1024)
+def _gene_knockout_re(gene: str) -> "re.Pattern[str]":
+    """Compile a pattern matching a gene as a whole whitespace-delimited token plus one adjacent space."""
+    escaped = re.escape(gene)
+    # Consume the space before the gene, or the one after it at the start of a line,
+    # so removal never leaves a double space behind
+    return re.compile(rf" {escaped}(?!\S)|(?<!\S){escaped}(?!\S) ?")
+
+
+def _knock_out(gene_sentence: str, gene: str) -> Tuple[str, int]:
+    """Remove every occurrence of a gene from a sentence, returning the new sentence and the number removed."""
+    sentence, removed = _gene_knockout_re(gene).subn("", gene_sentence)
+    # Normalize whitespace so the result matches a split/join of the remaining genes
+    return _WS.sub(" ", sentence).strip(), removed
+
+
+def _completion_payload(
+    prompt: Union[str, List[str]],
+    model: str,
+    max_tokens: int,
+    temperature: float,
+    top_p: float
+) -> Dict[str, Any]:
+    """Build the vLLM completions request body for one prompt or a list of prompts."""
+    return {
+        **_BASE_PAYLOAD,
+        "model": model,
+        "prompt": encode_prompt(model, prompt) if isinstance(prompt, str) else [encode_prompt(model, p) for p in prompt],
+        "max_tokens": max_tokens,
+        "temperature": temperature,
+        "top_p": top_p
+    }
+
+
+def _prediction_cache_key(
+    prompt: str,
+    vllm_base_url: str,
+    model: str,
+    max_tokens: int,
+    temperature: float,
+    top_p: float
+) -> Optional[Tuple[str, str, str, int, float]]:
+    """Cache key of a prediction, or None when sampling makes the completion non-deterministic."""
+    if temperature > 0:
+        return None
+    return (prompt, vllm_base_url, model, max_tokens, top_p)
+
+
+def _cached_age(key: Optional[Tuple[str, str, str, int, float]]) -> Optional[float]:
+    """Look up a cached prediction, marking it as recently used."""
+    if key is None:
+        return None
+    with _PREDICTION_CACHE_LOCK:
+        age = _PREDICTION_CACHE.get(key)
+        if age is not None:
+            _PREDICTION_CACHE.move_to_end(key)
+        return age
+
+
+def _cache_age(key: Optional[Tuple[str, str, str, int, float]], age: float) -> None:
+    """Store a prediction, evicting the least recently used one when the cache is full."""
+    if key is None:
+        return
+    with _PREDICTION_CACHE_LOCK:
+        _PREDICTION_CACHE[key] = age
+        _PREDICTION_CACHE.move_to_end(key)
+        if len(_PREDICTION_CACHE) > PREDICTION_CACHE_SIZE:
+            _PREDICTION_CACHE.popitem(last=False)
+
+
+def clear_prediction_cache() -> None:
+    """Forget every cached prediction, e.g. before timing a run or after the model is redeployed."""
+    with _PREDICTION_CACHE_LOCK:
+        _PREDICTION_CACHE.clear()
+
+
+def extract_age(raw_response: str) -> Optional[float]:
+    """Extract the predicted age from a raw model response, or None if it contains no number."""
+    # The model usually answers with the bare number, so a first token that is exactly one
+    # number (as the regex defines it) is converted directly, before searching the whole text
+    head = raw_response.split(None, 1)
+    if head:
+        token = head[0].rstrip(",.;")
+        if _AGE_RE.fullmatch(token):
+            return float(token)
+    match = _AGE_RE.search(raw_response)
+    return float(match.group()) if match else None
+
+
+def _age_complete(text: str) -> bool:
+    """Whether a partial streamed response already contains a finished number (one followed by another character)."""
+    match = _AGE_RE.search(text)
+    if match is None:
+        return False
+    # A number followed only by "." may still continue with decimals in the next chunk
+    return text[match.end():] not in ("", ".")
+
+
+def _parse_age(raw_response: str) -> float:
+    """Extract the predicted age from a raw model response."""
+    predicted_age = extract_age(raw_response)
+    if predicted_age is None:
+        raise ValueError(f"Could not extract age from response: {raw_response}")
+    return predicted_age
+
+
+async def apredict_age_core(
+    prompt: str,
+    vllm_base_url: str,
+    model: str,
+    max_tokens: int,
+    temperature: float,
+    top_p: float
+) -> Tuple[Optional[float], str]:
+    """
+    Send one prompt to the vLLM completions API and parse the predicted age.
+    
+    Single HTTP prompts are streamed and the stream is closed as soon as the first number is
+    complete, so vLLM aborts the sequence instead of decoding up to `max_tokens`. Deterministic
+    requests go through the loop's `VLLMBatcher`, so predictions issued concurrently (e.g. by
+    parallel MCP clients) are sent to vLLM as one list prompt, or to the in-process engine as one
+    `generate` call with VLLM_INPROCESS=1.
+    """
+    if temperature > 0:
+        backend = get_inprocess_backend(model)
+        if backend is not None:
+            text = (await backend.agenerate([prompt], max_tokens, temperature, top_p, _STOP))[0]
+        else:
+            text = await _astream_completion(prompt, vllm_base_url, model, max_tokens, temperature, top_p)
+        return extract_age(text), text.strip()
+    
+    # Deterministic requests are safe to coalesce with concurrent ones into a single batch
+    text = await _get_batcher(vllm_base_url, model, max_tokens, top_p).submit(prompt)
+    return extract_age(text), text.strip()
+
+
+async def _astream_completion(
+    prompt: str,
+    vllm_base_url: str,
+    model: str,
+    max_tokens: int,
+    temperature: float,
+    top_p: float
+) -> str:
+    """Stream a completion, closing the stream as soon as the first number is complete."""
+    text = ""
+    async with get_async_client().stream(
+        "POST",
+        completions_url(vllm_base_url),
+        content=orjson.dumps({**_completion_payload(prompt, model, max_tokens, temperature, top_p), "stream": True}),
+        headers=JSON_HEADERS
+    ) as response:
+        response.raise_for_status()
+        async for line in response.aiter_lines():
+            if not line.startswith(_SSE_DATA):
+                continue
+            data = line[len(_SSE_DATA):]
+            if data == _SSE_DONE:
+                break
+            text += orjson.loads(data)["choices"][0]["text"]
+            if _age_complete(text):
+                break
+    return text
+
+
+def _get_batcher(vllm_base_url: str, model: str, max_tokens: int, top_p: float) -> VLLMBatcher:
+    """Return the running loop's batcher for deterministic requests with these sampling parameters."""
+    loop = asyncio.get_running_loop()
+    batchers = _BATCHERS.get(loop)
+    if batchers is None:
+        prune_closed_loops(_BATCHERS)
+        batchers = _BATCHERS[loop] = {}
+    key = (vllm_base_url, model, max_tokens, top_p)
+    batcher = batchers.get(key)
+    if batcher is None:
+        async def send(prompts: List[str]) -> List[str]:
+            # A lone HTTP prompt keeps the streaming early exit; bursts (and in-process prompts) go out as one batch
+            if len(prompts) == 1 and get_inprocess_backend(model) is None:
+                return [await _astream_completion(prompts[0], vllm_base_url, model, max_tokens, 0.0, top_p)]
+            return await acomplete_batch(prompts, vllm_base_url, model, max_tokens, 0.0, top_p)
+        batcher = VLLMBatcher(send)
+        batchers[key] = batcher
+    return batcher
+
+
+async def apredict_age_from_sentence(
     gene_sentence: str,
     vllm_base_url: str,
     model: str,
@@ -27,14 +294,17 @@ def predict_age_from_sentence(
     smoking_status: Optional[int] = None,
     tissue: Optional[str] = None,
     cell_type: Optional[str] = None,
-    max_tokens: int = 20,
+    max_tokens: int = DEFAULT_MAX_TOKENS,
     temperature: float = 0.0,
     top_p: float = 1.0,
-    gene_to_remove: Optional[str] = None
+    gene_count: Optional[int] = None
 ) -> float:
     """
     Predict age from a gene expression sentence.
     
+    Requests go through the event loop's pooled httpx client; concurrent deterministic
+    predictions are coalesced into one batched vLLM request.
+    
     Args:
         gene_sentence: Space-separated list of gene names ordered by descending expression level
         vllm_base_url: Base URL for the vLLM API server
@@ -46,80 +316,64 @@ def predict_age_from_sentence(
         max_tokens: Maximum number of tokens to generate
         temperature: Sampling temperature
         top_p: Nucleus sampling parameter
-        gene_to_remove: Gene symbol to remove from the entire prompt (for knockout experiments)
+        gene_count: Number of genes in the sentence, if the caller already split it (only used for logging)
         
     Returns:
         Predicted age as a float
     """
     with start_action(
         action_type="predict_age_from_sentence",
-        gene_count=len(gene_sentence.split())
+        gene_count=gene_count if gene_count is not None else len(gene_sentence.split())
     ) as action:
-        # Build prompt with metadata if provided
-        prompt_parts = [
-            "The following is a list of aging related gene names ordered by descending expression level in a cell.\n"
-        ]
-        
-        if sex:
-            prompt_parts.append(f"Sex: {sex}")
-        if smoking_status is not None:
-            prompt_parts.append(f"Smoking status: {smoking_status}")
-        if tissue:
-            prompt_parts.append(f"Tissue: {tissue}")
-        if cell_type:
-            prompt_parts.append(f"Cell type: {cell_type}")
-        
-        prompt_parts.append(f"Aging related cell sentence: {gene_sentence}")
-        prompt_parts.append("Predict the Age of the donor from whom these cells were taken.")
-        prompt_parts.append("Answer only with age value in years:")
-        
-        prompt = "\n".join(prompt_parts)
-        
-        # Remove the gene symbol from the entire prompt if specified
-        if gene_to_remove:
-            # Replace gene symbol followed by space, or space followed by gene symbol
-            import re
-            # Remove gene with surrounding spaces, then clean up multiple spaces
-            prompt = prompt.replace(f" {gene_to_remove} ", " ")
-            prompt = prompt.replace(f" {gene_to_remove}", "")
-            prompt = prompt.replace(f"{gene_to_remove} ", "")
-            # Clean up any multiple spaces
-            prompt = re.sub(r'\s+', ' ', prompt)
-            action.log(message_type="gene_removed_from_prompt", gene=gene_to_remove)
-        
-        # Use vLLM completions API directly
-        payload = {
-            "model": model,
-            "prompt": prompt,
-            "max_tokens": max_tokens,
-            "temperature": temperature,
-            "top_p": top_p,
-            "n": 1,
-            "stop": ["<ctrl100>", "<end_of_turn>", "<eos>"]
-        }
-        
-        # Ensure URL ends with /v1/completions
-        url = vllm_base_url.rstrip("/") + "/v1/completions"
-        response = requests.post(url, json=payload, timeout=60)
-        response.raise_for_status()
+        prompt = build_prompt(gene_sentence, sex, smoking_status, tissue, cell_type)
         
-        result_data = response.json()
-        raw_response = result_data["choices"][0]["text"].strip()
-        action.log(message_type="raw_response", response=raw_response)
+        cache_key = _prediction_cache_key(prompt, vllm_base_url, model, max_tokens, temperature, top_p)
+        cached_age = _cached_age(cache_key)
+        if cached_age is not None:
+            action.add_success_fields(predicted_age=cached_age, cache_hit=True)
+            return cached_age
         
-        # Try to extract age as a number
-        import re
-        numbers = re.findall(r'\d+\.?\d*', raw_response)
-        if not numbers:
-            action.log(message_type="parse_error", raw_response=raw_response)
+        predicted_age, raw_response = await apredict_age_core(prompt, vllm_base_url, model, max_tokens, temperature, top_p)
+        if DEBUG:
+            action.log(message_type="raw_response", response=raw_response)
+        if predicted_age is None:
             raise ValueError(f"Could not extract age from response: {raw_response}")
         
-        predicted_age = float(numbers[0])
-        action.add_success_fields(predicted_age=predicted_age)
+        _cache_age(cache_key, predicted_age)
+        action.add_success_fields(predicted_age=predicted_age, cache_hit=False)
         return predicted_age
 
 
-def insilico_knockout(
+def predict_age_from_sentence(
+    gene_sentence: str,
+    vllm_base_url: str,
+    model: str,
+    sex: Optional[str] = None,
+    smoking_status: Optional[int] = None,
+    tissue: Optional[str] = None,
+    cell_type: Optional[str] = None,
+    max_tokens: int = DEFAULT_MAX_TOKENS,
+    temperature: float = 0.0,
+    top_p: float = 1.0,
+    gene_count: Optional[int] = None
+) -> float:
+    """Synchronous wrapper around `apredict_age_from_sentence` for scripts and the CLI."""
+    return run_sync(apredict_age_from_sentence(
+        gene_sentence=gene_sentence,
+        vllm_base_url=vllm_base_url,
+        model=model,
+        sex=sex,
+        smoking_status=smoking_status,
+        tissue=tissue,
+        cell_type=cell_type,
+        max_tokens=max_tokens,
+        temperature=temperature,
+        top_p=top_p,
+        gene_count=gene_count
+    ))
+
+
+async def ainsilico_knockout(
     gene_symbol: str,
     gene_sentence: str,
     vllm_base_url: str,
@@ -128,21 +382,21 @@ def insilico_knockout(
     smoking_status: Optional[int] = None,
     tissue: Optional[str] = None,
     cell_type: Optional[str] = None,
-    max_tokens: int = 20,
+    max_tokens: int = DEFAULT_MAX_TOKENS,
     temperature: float = 0.0,
     top_p: float = 1.0
 ) -> KnockoutResult:
     """
-    Perform an insilico knockout experiment by removing a specific gene from the entire prompt.
+    Perform an insilico knockout experiment by removing a specific gene from the gene sentence.
     
     This function:
     1. Predicts age from the original gene sentence
-    2. Predicts age again with the gene symbol removed from the entire prompt
+    2. Predicts age again from the sentence with the gene symbol removed
     3. Computes the delta
-    4. Warns if the gene was not found in the sentence
+    4. Warns if the gene was not found in the sentence (only one prediction is made and the delta is 0)
     
     Args:
-        gene_symbol: The gene symbol to knock out (remove from the entire prompt)
+        gene_symbol: The gene symbol to knock out (remove from the gene sentence)
         gene_sentence: Space-separated list of gene names ordered by descending expression level
         vllm_base_url: Base URL for the vLLM API server
         model: Model name to use for prediction
@@ -157,38 +411,38 @@ def insilico_knockout(
     Returns:
         KnockoutResult containing original age, knockout age, delta, and optional warning
     """
+    # Split gene sentence into individual genes once; counts and membership are reused below
+    genes = gene_sentence.split()
+    n = len(genes)
+    
     with start_action(
         action_type="insilico_knockout",
         gene_symbol=gene_symbol,
-        original_gene_count=len(gene_sentence.split())
+        original_gene_count=n
     ) as action:
-        # Split gene sentence into individual genes
-        genes = gene_sentence.split()
-        
-        if not genes:
-            raise ValueError("Gene sentence is empty")
+        _validate_knockout(genes, [gene_symbol])
         
-        # Check if the gene exists in the sentence
+        # Same membership test as the batch and sweep knockouts; the knockout sentence is built
+        # in one regex pass, and the original sentence is kept untouched when the gene is absent
+        found = gene_symbol in genes
+        knockout_sentence, removed = _knock_out(gene_sentence, gene_symbol) if found else (gene_sentence, 0)
         warning_msg = None
-        if gene_symbol not in genes:
+        if not found:
             warning_msg = f"Warning: Gene '{gene_symbol}' not found in the gene sentence"
             action.log(message_type="gene_not_found", gene=gene_symbol, warning=warning_msg)
         
-        # Create knockout sentence by removing the gene
-        knockout_genes = [g for g in genes if g != gene_symbol]
-        knockout_sentence = " ".join(knockout_genes)
-        
         action.log(
             message_type="knockout_gene", 
             gene=gene_symbol,
-            found=gene_symbol in genes,
-            original_count=len(genes),
-            knockout_count=len(knockout_genes)
+            found=found,
+            original_count=n,
+            knockout_count=n - removed
         )
         
         # Predict age with original sentence (no gene removal)
-        age_original = predict_age_from_sentence(
+        baseline = apredict_age_from_sentence(
             gene_sentence=gene_sentence,
+            gene_count=n,
             vllm_base_url=vllm_base_url,
             model=model,
             sex=sex,
@@ -197,24 +451,34 @@ def insilico_knockout(
             cell_type=cell_type,
             max_tokens=max_tokens,
             temperature=temperature,
-            top_p=top_p,
-            gene_to_remove=None
+            top_p=top_p
         )
         
-        # Predict age with gene removed from entire prompt
-        age_knockout = predict_age_from_sentence(
-            gene_sentence=gene_sentence,  # Keep original sentence
-            vllm_base_url=vllm_base_url,
-            model=model,
-            sex=sex,
-            smoking_status=smoking_status,
-            tissue=tissue,
-            cell_type=cell_type,
-            max_tokens=max_tokens,
-            temperature=temperature,
-            top_p=top_p,
-            gene_to_remove=gene_symbol  # Remove gene from entire prompt
-        )
+        if found:
+            # The two predictions are independent, so both requests are in flight at once
+            # and vLLM can co-batch them: wall-clock is one round-trip instead of two
+            age_original, age_knockout = await asyncio.gather(
+                baseline,
+                # Predict age with the gene removed from the sentence
+                apredict_age_from_sentence(
+                    gene_sentence=knockout_sentence,
+                    gene_count=n - removed,
+                    vllm_base_url=vllm_base_url,
+                    model=model,
+                    sex=sex,
+                    smoking_status=smoking_status,
+                    tissue=tissue,
+                    cell_type=cell_type,
+                    max_tokens=max_tokens,
+                    temperature=temperature,
+                    top_p=top_p
+                )
+            )
+        else:
+            # Without the gene both prompts are identical, so one prediction serves both sides
+            # and the delta is exactly 0 even when sampling with temperature > 0
+            age_original = await baseline
+            age_knockout = age_original
         
         # Calculate delta
         delta_age = age_knockout - age_original
@@ -232,7 +496,7 @@ def insilico_knockout(
         
         action.add_success_fields(
             gene_knocked_out=gene_symbol,
-            gene_found=gene_symbol in genes,
+            gene_found=found,
             age_prediction=age_original,
             age_prediction_with_knockout=age_knockout,
             delta_age=delta_age,
@@ -241,3 +505,326 @@ def insilico_knockout(
         
         return result
 
+
+
+def insilico_knockout(
+    gene_symbol: str,
+    gene_sentence: str,
+    vllm_base_url: str,
+    model: str,
+    sex: Optional[str] = None,
+    smoking_status: Optional[int] = None,
+    tissue: Optional[str] = None,
+    cell_type: Optional[str] = None,
+    max_tokens: int = DEFAULT_MAX_TOKENS,
+    temperature: float = 0.0,
+    top_p: float = 1.0
+) -> KnockoutResult:
+    """Synchronous wrapper around `ainsilico_knockout` for scripts and the CLI."""
+    return run_sync(ainsilico_knockout(
+        gene_symbol=gene_symbol,
+        gene_sentence=gene_sentence,
+        vllm_base_url=vllm_base_url,
+        model=model,
+        sex=sex,
+        smoking_status=smoking_status,
+        tissue=tissue,
+        cell_type=cell_type,
+        max_tokens=max_tokens,
+        temperature=temperature,
+        top_p=top_p
+    ))
+
+
+async def acomplete_batch(
+    prompts: List[str],
+    vllm_base_url: str,
+    model: str,
+    max_tokens: int,
+    temperature: float,
+    top_p: float
+) -> List[str]:
+    """
+    Send several prompts in one vLLM completions request and return the raw texts in prompt order.
+    
+    Servers that reject list prompts get the prompts as concurrent single-prompt requests instead.
+    With VLLM_INPROCESS=1 the prompts go straight to the in-process engine.
+    """
+    backend = get_inprocess_backend(model)
+    if backend is not None:
+        return await backend.agenerate(prompts, max_tokens, temperature, top_p, _STOP)
+    
+    client = get_async_client()
+    url = completions_url(vllm_base_url)
+    response = await client.post(
+        url,
+        content=orjson.dumps(_completion_payload(prompts, model, max_tokens, temperature, top_p)),
+        headers=JSON_HEADERS
+    )
+    if response.status_code in (400, 422) and len(prompts) > 1:
+        with start_action(action_type="batch_prompt_fallback", prompt_count=len(prompts), status=response.status_code):
+            return [
+                text
+                for texts in await asyncio.gather(*[
+                    acomplete_batch([prompt], vllm_base_url, model, max_tokens, temperature, top_p)
+                    for prompt in prompts
+                ])
+                for text in texts
+            ]
+    response.raise_for_status()
+    choices = sorted(orjson.loads(response.content)["choices"], key=lambda choice: choice["index"])
+    # Texts are only searched for the age, so they are returned unstripped
+    return [choice["text"] for choice in choices]
+
+
+def _validate_knockout(genes: List[str], gene_symbols: List[str]) -> None:
+    """Reject an empty sentence and gene symbols that cannot match one whitespace-delimited gene."""
+    if not genes:
+        raise ValueError("Gene sentence is empty")
+    for gene in gene_symbols:
+        if not gene.strip():
+            raise ValueError("Gene symbol is empty")
+        if _WS.search(gene):
+            raise ValueError(f"Gene symbol must be a single gene without whitespace, got '{gene}'")
+
+
+def _knockout_sentences(gene_sentence: str, genes: List[str], gene_symbols: List[str]) -> Dict[str, str]:
+    """
+    Validate a multi-gene knockout and build the knockout sentence of every distinct gene found.
+    
+    Genes that are not in the sentence reuse the baseline prediction, so they get no entry.
+    """
+    _validate_knockout(genes, gene_symbols)
+    present = set(genes)
+    return {
+        gene: _knock_out(gene_sentence, gene)[0]
+        for gene in dict.fromkeys(gene_symbols)
+        if gene in present
+    }
+
+
+def _knockout_results(
+    gene_symbols: List[str],
+    gene_sentence: str,
+    knockout_sentences: Dict[str, str],
+    age_original: float,
+    knockout_ages: Dict[str, float],
+    model: str,
+    action: Action
+) -> List[KnockoutResult]:
+    """Assemble one KnockoutResult per gene symbol, warning about genes missing from the sentence."""
+    results = []
+    for gene in gene_symbols:
+        warning_msg = None
+        if gene not in knockout_sentences:
+            warning_msg = f"Warning: Gene '{gene}' not found in the gene sentence"
+            action.log(message_type="gene_not_found", gene=gene, warning=warning_msg)
+        age_knockout = knockout_ages.get(gene, age_original)
+        results.append(KnockoutResult(
+            gene_knocked_out=gene,
+            age_prediction=age_original,
+            age_prediction_with_knockout=age_knockout,
+            delta_age=age_knockout - age_original,
+            original_gene_sentence=gene_sentence,
+            knockout_gene_sentence=knockout_sentences.get(gene, gene_sentence),
+            model=model,
+            warning=warning_msg
+        ))
+    return results
+
+
+async def abatch_insilico_knockout(
+    gene_symbols: List[str],
+    gene_sentence: str,
+    vllm_base_url: str,
+    model: str,
+    sex: Optional[str] = None,
+    smoking_status: Optional[int] = None,
+    tissue: Optional[str] = None,
+    cell_type: Optional[str] = None,
+    max_tokens: int = DEFAULT_MAX_TOKENS,
+    temperature: float = 0.0,
+    top_p: float = 1.0,
+    batch_size: int = DEFAULT_BATCH_SIZE
+) -> List[KnockoutResult]:
+    """
+    Knock out several genes from the same gene sentence using batched vLLM requests.
+    
+    The baseline and all knockout prompts are sent as list prompts in batches of `batch_size`,
+    and the batches are dispatched concurrently, so a sweep over N genes costs about N / batch_size
+    round-trips instead of 2N.
+    
+    Args:
+        gene_symbols: Gene symbols to knock out, one knockout per gene
+        gene_sentence: Space-separated list of gene names ordered by descending expression level
+        vllm_base_url: Base URL for the vLLM API server
+        model: Model name to use for prediction
+        sex: Sex of the donor (e.g., 'male', 'female')
+        smoking_status: Smoking status (0 = non-smoker, 1 = smoker)
+        tissue: Tissue type (e.g., 'blood', 'brain', 'liver')
+        cell_type: Cell type (e.g., 'CD14-low, CD16-positive monocyte')
+        max_tokens: Maximum number of tokens to generate
+        temperature: Sampling temperature
+        top_p: Nucleus sampling parameter
+        batch_size: Maximum number of prompts per vLLM request
+        
+    Returns:
+        One KnockoutResult per gene symbol, in the order given
+    """
+    genes = gene_sentence.split()
+    
+    with start_action(
+        action_type="batch_insilico_knockout",
+        gene_symbols=gene_symbols,
+        original_gene_count=len(genes),
+        batch_size=batch_size
+    ) as action:
+        # Genes that are not in the sentence reuse the baseline prediction, so only found genes get a prompt
+        knockout_sentences = _knockout_sentences(gene_sentence, genes, gene_symbols)
+        prompts = [build_prompt(gene_sentence, sex, smoking_status, tissue, cell_type)] + [
+            build_prompt(sentence, sex, smoking_status, tissue, cell_type)
+            for sentence in knockout_sentences.values()
+        ]
+        
+        # Only prompts without a cached deterministic prediction are sent to vLLM
+        cache_keys = [
+            _prediction_cache_key(prompt, vllm_base_url, model, max_tokens, temperature, top_p)
+            for prompt in prompts
+        ]
+        ages = [_cached_age(key) for key in cache_keys]
+        missing = [index for index, age in enumerate(ages) if age is None]
+        
+        batches = await asyncio.gather(*[
+            acomplete_batch(
+                [prompts[index] for index in missing[start:start + batch_size]],
+                vllm_base_url, model, max_tokens, temperature, top_p
+            )
+            for start in range(0, len(missing), batch_size)
+        ])
+        for index, text in zip(missing, (text for batch in batches for text in batch)):
+            ages[index] = _parse_age(text)
+            _cache_age(cache_keys[index], ages[index])
+        
+        age_original = ages[0]
+        knockout_ages = dict(zip(knockout_sentences, ages[1:]))
+        results = _knockout_results(
+            gene_symbols, gene_sentence, knockout_sentences, age_original, knockout_ages, model, action
+        )
+        
+        action.add_success_fields(
+            age_prediction=age_original,
+            knockout_count=len(results),
+            request_count=len(batches),
+            cache_hits=len(prompts) - len(missing)
+        )
+        return results
+
+
+def batch_insilico_knockout(
+    gene_symbols: List[str],
+    gene_sentence: str,
+    vllm_base_url: str,
+    model: str,
+    sex: Optional[str] = None,
+    smoking_status: Optional[int] = None,
+    tissue: Optional[str] = None,
+    cell_type: Optional[str] = None,
+    max_tokens: int = DEFAULT_MAX_TOKENS,
+    temperature: float = 0.0,
+    top_p: float = 1.0,
+    batch_size: int = DEFAULT_BATCH_SIZE
+) -> List[KnockoutResult]:
+    """Synchronous wrapper around `abatch_insilico_knockout` for scripts and the CLI."""
+    return run_sync(abatch_insilico_knockout(
+        gene_symbols=gene_symbols,
+        gene_sentence=gene_sentence,
+        vllm_base_url=vllm_base_url,
+        model=model,
+        sex=sex,
+        smoking_status=smoking_status,
+        tissue=tissue,
+        cell_type=cell_type,
+        max_tokens=max_tokens,
+        temperature=temperature,
+        top_p=top_p,
+        batch_size=batch_size
+    ))
+
+
+async def asweep_insilico_knockout(
+    gene_sentence: str,
+    vllm_base_url: str,
+    model: str,
+    gene_symbols: Optional[List[str]] = None,
+    sex: Optional[str] = None,
+    smoking_status: Optional[int] = None,
+    tissue: Optional[str] = None,
+    cell_type: Optional[str] = None,
+    max_tokens: int = DEFAULT_MAX_TOKENS,
+    temperature: float = 0.0,
+    top_p: float = 1.0,
+    concurrency: int = SWEEP_CONCURRENCY
+) -> List[KnockoutResult]:
+    """
+    Knock out genes one at a time with many single predictions in flight at once.
+    
+    The baseline is predicted once, then every knockout prediction is submitted concurrently,
+    bounded by a semaphore of `concurrency`, so vLLM's continuous batching packs them into the
+    same decoding steps.
+    
+    Args:
+        gene_sentence: Space-separated list of gene names ordered by descending expression level
+        vllm_base_url: Base URL for the vLLM API server
+        model: Model name to use for prediction
+        gene_symbols: Gene symbols to knock out; defaults to every distinct gene of the sentence
+        sex: Sex of the donor (e.g., 'male', 'female')
+        smoking_status: Smoking status (0 = non-smoker, 1 = smoker)
+        tissue: Tissue type (e.g., 'blood', 'brain', 'liver')
+        cell_type: Cell type (e.g., 'CD14-low, CD16-positive monocyte')
+        max_tokens: Maximum number of tokens to generate
+        temperature: Sampling temperature
+        top_p: Nucleus sampling parameter
+        concurrency: Maximum number of knockout predictions in flight
+        
+    Returns:
+        One KnockoutResult per gene symbol, in the order given
+    """
+    genes = gene_sentence.split()
+    symbols = list(dict.fromkeys(genes)) if gene_symbols is None else gene_symbols
+    
+    with start_action(
+        action_type="sweep_insilico_knockout",
+        gene_count=len(genes),
+        knockout_count=len(symbols),
+        concurrency=concurrency
+    ) as action:
+        # Genes that are not in the sentence reuse the baseline, so only found genes are predicted
+        knockout_sentences = _knockout_sentences(gene_sentence, genes, symbols)
+        semaphore = asyncio.Semaphore(concurrency)
+        
+        async def predict(sentence: str) -> float:
+            async with semaphore:
+                return await apredict_age_from_sentence(
+                    gene_sentence=sentence,
+                    vllm_base_url=vllm_base_url,
+                    model=model,
+                    sex=sex,
+                    smoking_status=smoking_status,
+                    tissue=tissue,
+                    cell_type=cell_type,
+                    max_tokens=max_tokens,
+                    temperature=temperature,
+                    top_p=top_p
+                )
+        
+        age_original = await predict(gene_sentence)
+        knockout_ages = dict(zip(
+            knockout_sentences,
+            await asyncio.gather(*[predict(sentence) for sentence in knockout_sentences.values()])
+        ))
+        results = _knockout_results(
+            symbols, gene_sentence, knockout_sentences, age_original, knockout_ages, model, action
+        )
+        
+        action.add_success_fields(age_prediction=age_original, knockout_count=len(results))
+        return results
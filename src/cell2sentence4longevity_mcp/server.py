@@ -1,28 +1,57 @@
 #!/usr/bin/env python3
 """Cell2Sentence4Longevity MCP Server - Age prediction interface using vLLM."""
 
-import os
+import asyncio
 from typing import Dict, Any, Optional, List
 from pathlib import Path
 
+import orjson
 import typer
 from fastmcp import FastMCP
 from pydantic import BaseModel, Field
-from eliot import start_action, to_file
-import requests
+from pydantic_settings import BaseSettings
+from eliot import Action, start_action, to_file
+
+from cell2sentence4longevity_mcp.inprocess import get_inprocess_backend
+from cell2sentence4longevity_mcp.vllm_client import CLIENT_TOKENIZE, get_tokenizer
+from cell2sentence4longevity_mcp.knockout import (
+    DEBUG,
+    DEFAULT_BATCH_SIZE,
+    DEFAULT_MAX_TOKENS,
+    KnockoutResult,
+    abatch_insilico_knockout,
+    acomplete_batch,
+    ainsilico_knockout,
+    apredict_age_core,
+    asweep_insilico_knockout,
+    build_prompt,
+    extract_age,
+)
+
+
+class Settings(BaseSettings):
+    """Server configuration, read and validated once from the environment (e.g. MCP_PORT, VLLM_MODEL)."""
+    mcp_host: str = "0.0.0.0"
+    mcp_port: int = 3002
+    mcp_transport: str = "streamable-http"
+    vllm_base_url: str = "http://89.169.110.141:8000"
+    vllm_model: str = "transhumanist-already-exists/C2S-Scale-Gemma-2-27B-age-prediction-fullft"
 
-from cell2sentence4longevity_mcp.knockout import insilico_knockout, KnockoutResult
 
 # Configuration
-DEFAULT_HOST = os.getenv("MCP_HOST", "0.0.0.0")
-DEFAULT_PORT = int(os.getenv("MCP_PORT", "3002"))
-DEFAULT_TRANSPORT = os.getenv("MCP_TRANSPORT", "streamable-http")
-VLLM_BASE_URL = os.getenv("VLLM_BASE_URL", "http://89.169.110.141:8000")
-DEFAULT_MODEL = os.getenv("VLLM_MODEL", "transhumanist-already-exists/C2S-Scale-Gemma-2-27B-age-prediction-fullft")
+SETTINGS = Settings()
+
+# Set once the eliot file destination is added, so repeated setup calls do not add duplicate destinations
+_LOGGING_CONFIGURED = False
 
 # Setup logging for MCP server
 def setup_mcp_logging() -> None:
     """Setup eliot logging for MCP server to avoid stderr interference."""
+    global _LOGGING_CONFIGURED
+    if _LOGGING_CONFIGURED:
+        return
+    _LOGGING_CONFIGURED = True
+    
     log_dir = Path("logs")
     log_dir.mkdir(parents=True, exist_ok=True)
     
@@ -53,8 +82,8 @@ class Cell2SentenceMCP(FastMCP):
     def __init__(
         self, 
         name: str = "Cell2Sentence4Longevity MCP Server",
-        vllm_base_url: str = VLLM_BASE_URL,
-        model: str = DEFAULT_MODEL,
+        vllm_base_url: str = SETTINGS.vllm_base_url,
+        model: str = SETTINGS.vllm_model,
         **kwargs
     ):
         """Initialize the Cell2Sentence tools with vLLM connection and FastMCP functionality."""
@@ -62,6 +91,11 @@ class Cell2SentenceMCP(FastMCP):
         
         self.vllm_base_url = vllm_base_url
         self.model = model
+        # Load the in-process engine at startup rather than on the first request (no-op unless VLLM_INPROCESS=1)
+        get_inprocess_backend(model)
+        # Likewise load the tokenizer up front when prompts are tokenized on the client
+        if CLIENT_TOKENIZE:
+            get_tokenizer(model)
         
         # Register our tools and resources
         self._register_tools()
@@ -74,6 +108,11 @@ class Cell2SentenceMCP(FastMCP):
             description="Predict the age of a cell donor from a gene expression sentence. The gene expression sentence should be a space-separated list of aging-related gene names ordered by descending expression level."
         )(self.predict_age)
         
+        self.tool(
+            name="predict_age_batch",
+            description="Predict the age of a cell donor for each of several gene expression sentences in one batched request. Each gene expression sentence should be a space-separated list of aging-related gene names ordered by descending expression level. Returns one result per sentence, in the order given."
+        )(self.predict_age_batch)
+        
         self.tool(
             name="predict_age_with_metadata",
             description="Predict the age of a cell donor from a gene expression sentence with additional metadata. Provide the gene expression sentence, sex, tissue, cell type, and other relevant metadata."
@@ -83,6 +122,16 @@ class Cell2SentenceMCP(FastMCP):
             name="insilico_knockout",
             description="Perform an insilico knockout experiment by removing a specific gene from the gene expression sentence and comparing age predictions. Provide the gene symbol to knock out and the gene expression sentence. Returns original age, knockout age, delta, and a warning if the gene was not found."
         )(self.insilico_knockout_tool)
+        
+        self.tool(
+            name="insilico_knockout_batch",
+            description="Perform insilico knockout experiments for several genes of the same gene expression sentence in one batched request. Provide the list of gene symbols to knock out (one knockout per gene) and the gene expression sentence. Returns one result per gene with the shared original age, knockout age, delta, and a warning if the gene was not found."
+        )(self.insilico_knockout_batch_tool)
+        
+        self.tool(
+            name="insilico_knockout_sweep",
+            description="Knock out genes of a gene expression sentence one at a time, with all knockout predictions running concurrently. By default every gene of the sentence is knocked out; optionally provide the gene symbols to knock out. Returns one result per gene with the shared original age, knockout age, delta, and a warning if the gene was not found."
+        )(self.insilico_knockout_sweep_tool)
     
     def _register_resources(self):
         """Register Cell2Sentence-specific resources."""
@@ -100,11 +149,10 @@ class Cell2SentenceMCP(FastMCP):
             """
             with start_action(action_type="get_example_prompt") as action:
                 try:
-                    import json
                     payload_path = get_example_payload_path()
                     if payload_path and payload_path.exists():
-                        with open(payload_path, 'r') as f:
-                            payload = json.load(f)
+                        with open(payload_path, 'rb') as f:
+                            payload = orjson.loads(f.read())
                             example_prompt = payload.get("prompt", "")
                             action.add_success_fields(file_exists=True, prompt_length=len(example_prompt))
                             return example_prompt
@@ -143,10 +191,45 @@ Metadata that can be provided:
 The gene names should come from aging-related genes (e.g., from the OpenGenes database) and be ordered by expression level (highest to lowest).
 """
     
-    def predict_age(
+    async def _predict(
+        self,
+        prompt: str,
+        max_tokens: int,
+        temperature: float,
+        top_p: float,
+        action: Action
+    ) -> AgePredictionResult:
+        """
+        Run a built prompt through vLLM and wrap the response as an AgePredictionResult.
+        
+        Async so that concurrent MCP clients overlap their requests on the server's event loop
+        (and vLLM can batch them) instead of being serialized behind blocking HTTP calls.
+        """
+        try:
+            predicted_age, raw_response = await apredict_age_core(
+                prompt, self.vllm_base_url, self.model, max_tokens, temperature, top_p
+            )
+            if DEBUG:
+                action.log(message_type="raw_response", response=raw_response)
+            
+            result = AgePredictionResult(
+                predicted_age=predicted_age,
+                raw_response=raw_response,
+                prompt_used=prompt,
+                model=self.model
+            )
+            
+            action.add_success_fields(predicted_age=predicted_age)
+            return result
+            
+        except Exception as e:
+            action.log(message_type="prediction_error", error=str(e))
+            raise ValueError(f"Error during age prediction: {e}") from e
+    
+    async def predict_age(
         self,
         gene_sentence: str,
-        max_tokens: int = 20,
+        max_tokens: int = DEFAULT_MAX_TOKENS,
         temperature: float = 0.0,
         top_p: float = 1.0
     ) -> AgePredictionResult:
@@ -155,7 +238,7 @@ The gene names should come from aging-related genes (e.g., from the OpenGenes da
         
         Args:
             gene_sentence: Space-separated list of gene names ordered by descending expression level
-            max_tokens: Maximum number of tokens to generate (default: 20)
+            max_tokens: Maximum number of tokens to generate (default: 8)
             temperature: Sampling temperature (default: 0.0 for deterministic output)
             top_p: Nucleus sampling parameter (default: 1.0)
             
@@ -168,66 +251,74 @@ The gene names should come from aging-related genes (e.g., from the OpenGenes da
             max_tokens=max_tokens,
             temperature=temperature
         ) as action:
-            prompt = f"""The following is a list of aging related gene names ordered by descending expression level in a cell.
-
-Aging related cell sentence: {gene_sentence}
-Predict the Age of the donor from whom these cells were taken.
-Answer only with age value in years:"""
+            prompt = build_prompt(gene_sentence)
+            
+            return await self._predict(prompt, max_tokens, temperature, top_p, action)
+    
+    async def predict_age_batch(
+        self,
+        gene_sentences: List[str],
+        max_tokens: int = DEFAULT_MAX_TOKENS,
+        temperature: float = 0.0,
+        top_p: float = 1.0
+    ) -> List[AgePredictionResult]:
+        """
+        Predict age for several gene expression sentences.
+        
+        The prompts are sent to vLLM as list prompts in batches of DEFAULT_BATCH_SIZE, dispatched
+        concurrently, so N sentences cost about N / DEFAULT_BATCH_SIZE round-trips instead of N.
+        
+        Args:
+            gene_sentences: Space-separated lists of gene names ordered by descending expression level
+            max_tokens: Maximum number of tokens to generate (default: 8)
+            temperature: Sampling temperature (default: 0.0 for deterministic output)
+            top_p: Nucleus sampling parameter (default: 1.0)
+            
+        Returns:
+            List[AgePredictionResult]: One result per gene sentence, in the order given
+        """
+        with start_action(
+            action_type="predict_age_batch",
+            sentence_count=len(gene_sentences),
+            max_tokens=max_tokens,
+            temperature=temperature
+        ) as action:
+            prompts = [build_prompt(gene_sentence) for gene_sentence in gene_sentences]
             
             try:
-                # Use vLLM completions API directly
-                payload = {
-                    "model": self.model,
-                    "prompt": prompt,
-                    "max_tokens": max_tokens,
-                    "temperature": temperature,
-                    "top_p": top_p,
-                    "n": 1,
-                    "stop": ["<ctrl100>", "<end_of_turn>", "<eos>"]
-                }
-                
-                # Ensure URL ends with /v1/completions
-                url = self.vllm_base_url.rstrip("/") + "/v1/completions"
-                response = requests.post(url, json=payload, timeout=60)
-                response.raise_for_status()
-                
-                result_data = response.json()
-                raw_response = result_data["choices"][0]["text"].strip()
-                action.log(message_type="raw_response", response=raw_response)
-                
-                # Try to extract age as a number
-                predicted_age = None
-                try:
-                    # Try to parse the response as a number
-                    import re
-                    numbers = re.findall(r'\d+\.?\d*', raw_response)
-                    if numbers:
-                        predicted_age = float(numbers[0])
-                except Exception as parse_error:
-                    action.log(message_type="parse_warning", error=str(parse_error))
-                
-                result = AgePredictionResult(
-                    predicted_age=predicted_age,
-                    raw_response=raw_response,
-                    prompt_used=prompt,
-                    model=self.model
-                )
-                
-                action.add_success_fields(predicted_age=predicted_age, raw_response=raw_response)
-                return result
-                
+                batches = await asyncio.gather(*[
+                    acomplete_batch(
+                        prompts[start:start + DEFAULT_BATCH_SIZE],
+                        self.vllm_base_url, self.model, max_tokens, temperature, top_p
+                    )
+                    for start in range(0, len(prompts), DEFAULT_BATCH_SIZE)
+                ])
             except Exception as e:
                 action.log(message_type="prediction_error", error=str(e))
                 raise ValueError(f"Error during age prediction: {e}") from e
+            
+            texts = [text for batch in batches for text in batch]
+            results = [
+                AgePredictionResult(
+                    predicted_age=extract_age(text),
+                    raw_response=text.strip(),
+                    prompt_used=prompt,
+                    model=self.model
+                )
+                for prompt, text in zip(prompts, texts)
+            ]
+            
+            action.add_success_fields(prediction_count=len(results), request_count=len(batches))
+            return results
     
-    def predict_age_with_metadata(
+    async def predict_age_with_metadata(
         self,
         gene_sentence: str,
         sex: Optional[str] = None,
         smoking_status: Optional[int] = None,
         tissue: Optional[str] = None,
         cell_type: Optional[str] = None,
-        max_tokens: int = 20,
+        max_tokens: int = DEFAULT_MAX_TOKENS,
         temperature: float = 0.0,
         top_p: float = 1.0
     ) -> AgePredictionResult:
@@ -240,7 +331,7 @@ Answer only with age value in years:"""
             smoking_status: Smoking status (0 = non-smoker, 1 = smoker)
             tissue: Tissue type (e.g., 'blood', 'brain', 'liver')
             cell_type: Cell type (e.g., 'CD14-low, CD16-positive monocyte')
-            max_tokens: Maximum number of tokens to generate (default: 20)
+            max_tokens: Maximum number of tokens to generate (default: 8)
             temperature: Sampling temperature (default: 0.0 for deterministic output)
             top_p: Nucleus sampling parameter (default: 1.0)
             
@@ -255,72 +346,11 @@ Answer only with age value in years:"""
             cell_type=cell_type
         ) as action:
             # Build prompt with metadata
-            prompt_parts = [
-                "The following is a list of aging related gene names ordered by descending expression level in a cell.\n"
-            ]
-            
-            if sex:
-                prompt_parts.append(f"Sex: {sex}")
-            if smoking_status is not None:
-                prompt_parts.append(f"Smoking status: {smoking_status}")
-            if tissue:
-                prompt_parts.append(f"Tissue: {tissue}")
-            if cell_type:
-                prompt_parts.append(f"Cell type: {cell_type}")
-            
-            prompt_parts.append(f"Aging related cell sentence: {gene_sentence}")
-            prompt_parts.append("Predict the Age of the donor from whom these cells were taken.")
-            prompt_parts.append("Answer only with age value in years:")
+            prompt = build_prompt(gene_sentence, sex, smoking_status, tissue, cell_type)
             
-            prompt = "\n".join(prompt_parts)
-            
-            try:
-                # Use vLLM completions API directly
-                payload = {
-                    "model": self.model,
-                    "prompt": prompt,
-                    "max_tokens": max_tokens,
-                    "temperature": temperature,
-                    "top_p": top_p,
-                    "n": 1,
-                    "stop": ["<ctrl100>", "<end_of_turn>", "<eos>"]
-                }
-                
-                # Ensure URL ends with /v1/completions
-                url = self.vllm_base_url.rstrip("/") + "/v1/completions"
-                response = requests.post(url, json=payload, timeout=60)
-                response.raise_for_status()
-                
-                result_data = response.json()
-                raw_response = result_data["choices"][0]["text"].strip()
-                action.log(message_type="raw_response", response=raw_response)
-                
-                # Try to extract age as a number
-                predicted_age = None
-                try:
-                    # Try to parse the response as a number
-                    import re
-                    numbers = re.findall(r'\d+\.?\d*', raw_response)
-                    if numbers:
-                        predicted_age = float(numbers[0])
-                except Exception as parse_error:
-                    action.log(message_type="parse_warning", error=str(parse_error))
-                
-                result = AgePredictionResult(
-                    predicted_age=predicted_age,
-                    raw_response=raw_response,
-                    prompt_used=prompt,
-                    model=self.model
-                )
-                
-                action.add_success_fields(predicted_age=predicted_age, raw_response=raw_response)
-                return result
-                
-            except Exception as e:
-                action.log(message_type="prediction_error", error=str(e))
-                raise ValueError(f"Error during age prediction: {e}") from e
+            return await self._predict(prompt, max_tokens, temperature, top_p, action)
     
-    def insilico_knockout_tool(
+    async def insilico_knockout_tool(
         self,
         gene_symbol: str,
         gene_sentence: str,
@@ -328,7 +358,7 @@ Answer only with age value in years:"""
         smoking_status: Optional[int] = None,
         tissue: Optional[str] = None,
         cell_type: Optional[str] = None,
-        max_tokens: int = 20,
+        max_tokens: int = DEFAULT_MAX_TOKENS,
         temperature: float = 0.0,
         top_p: float = 1.0
     ) -> KnockoutResult:
@@ -349,14 +379,15 @@ Answer only with age value in years:"""
             smoking_status: Smoking status (0 = non-smoker, 1 = smoker)
             tissue: Tissue type (e.g., 'blood', 'brain', 'liver')
             cell_type: Cell type (e.g., 'CD14-low, CD16-positive monocyte')
-            max_tokens: Maximum number of tokens to generate (default: 20)
+            max_tokens: Maximum number of tokens to generate (default: 8)
             temperature: Sampling temperature (default: 0.0 for deterministic output)
             top_p: Nucleus sampling parameter (default: 1.0)
             
         Returns:
             KnockoutResult: Contains original age, knockout age, delta, gene information, and optional warning
         """
-        return insilico_knockout(
+        # Async so both predictions run concurrently on the server's event loop without blocking it
+        return await ainsilico_knockout(
             gene_symbol=gene_symbol,
             gene_sentence=gene_sentence,
             vllm_base_url=self.vllm_base_url,
@@ -370,6 +401,95 @@ Answer only with age value in years:"""
             top_p=top_p
         )
 
+    
+    async def insilico_knockout_batch_tool(
+        self,
+        gene_symbols: List[str],
+        gene_sentence: str,
+        sex: Optional[str] = None,
+        smoking_status: Optional[int] = None,
+        tissue: Optional[str] = None,
+        cell_type: Optional[str] = None,
+        max_tokens: int = DEFAULT_MAX_TOKENS,
+        temperature: float = 0.0,
+        top_p: float = 1.0
+    ) -> List[KnockoutResult]:
+        """
+        Perform insilico knockout experiments for several genes of the same sentence.
+        
+        The baseline and every knockout prompt are sent to vLLM as list prompts, so a sweep
+        over N genes takes a few batched requests instead of 2N single predictions.
+        
+        Args:
+            gene_symbols: The gene symbols to knock out, one knockout per gene
+            gene_sentence: Space-separated list of gene names ordered by descending expression level
+            sex: Sex of the donor (e.g., 'male', 'female')
+            smoking_status: Smoking status (0 = non-smoker, 1 = smoker)
+            tissue: Tissue type (e.g., 'blood', 'brain', 'liver')
+            cell_type: Cell type (e.g., 'CD14-low, CD16-positive monocyte')
+            max_tokens: Maximum number of tokens to generate (default: 8)
+            temperature: Sampling temperature (default: 0.0 for deterministic output)
+            top_p: Nucleus sampling parameter (default: 1.0)
+            
+        Returns:
+            List[KnockoutResult]: One result per gene symbol, in the order given
+        """
+        return await abatch_insilico_knockout(
+            gene_symbols=gene_symbols,
+            gene_sentence=gene_sentence,
+            vllm_base_url=self.vllm_base_url,
+            model=self.model,
+            sex=sex,
+            smoking_status=smoking_status,
+            tissue=tissue,
+            cell_type=cell_type,
+            max_tokens=max_tokens,
+            temperature=temperature,
+            top_p=top_p
+        )
+    
+    async def insilico_knockout_sweep_tool(
+        self,
+        gene_sentence: str,
+        gene_symbols: Optional[List[str]] = None,
+        sex: Optional[str] = None,
+        smoking_status: Optional[int] = None,
+        tissue: Optional[str] = None,
+        cell_type: Optional[str] = None,
+        max_tokens: int = DEFAULT_MAX_TOKENS,
+        temperature: float = 0.0,
+        top_p: float = 1.0
+    ) -> List[KnockoutResult]:
+        """
+        Knock out genes of a sentence one at a time with concurrent predictions.
+        
+        Args:
+            gene_sentence: Space-separated list of gene names ordered by descending expression level
+            gene_symbols: The gene symbols to knock out (default: every gene of the sentence)
+            sex: Sex of the donor (e.g., 'male', 'female')
+            smoking_status: Smoking status (0 = non-smoker, 1 = smoker)
+            tissue: Tissue type (e.g., 'blood', 'brain', 'liver')
+            cell_type: Cell type (e.g., 'CD14-low, CD16-positive monocyte')
+            max_tokens: Maximum number of tokens to generate (default: 8)
+            temperature: Sampling temperature (default: 0.0 for deterministic output)
+            top_p: Nucleus sampling parameter (default: 1.0)
+            
+        Returns:
+            List[KnockoutResult]: One result per knocked out gene
+        """
+        return await asweep_insilico_knockout(
+            gene_sentence=gene_sentence,
+            vllm_base_url=self.vllm_base_url,
+            model=self.model,
+            gene_symbols=gene_symbols,
+            sex=sex,
+            smoking_status=smoking_status,
+            tissue=tissue,
+            cell_type=cell_type,
+            max_tokens=max_tokens,
+            temperature=temperature,
+            top_p=top_p
+        )
 
 # Setup logging before initializing MCP server
 setup_mcp_logging()
@@ -381,25 +501,25 @@ mcp = Cell2SentenceMCP()
 app = typer.Typer(help="Cell2Sentence4Longevity MCP Server - Age prediction interface using vLLM")
 
 @app.command("run")
-def cli_app(
-    host: str = typer.Option(DEFAULT_HOST, "--host", help="Host to bind to"),
-    port: int = typer.Option(DEFAULT_PORT, "--port", help="Port to bind to"),
-    transport: str = typer.Option("streamable-http", "--transport", help="Transport type")
+def run_command(
+    host: str = typer.Option(SETTINGS.mcp_host, "--host", help="Host to bind to"),
+    port: int = typer.Option(SETTINGS.mcp_port, "--port", help="Port to bind to"),
+    transport: str = typer.Option(SETTINGS.mcp_transport, "--transport", help="Transport type")
 ) -> None:
     """Run the MCP server with specified transport."""
     mcp.run(transport=transport, host=host, port=port)
 
 @app.command("stdio")
-def cli_app_stdio(
+def stdio_command(
     verbose: bool = typer.Option(False, "--verbose", "-v", help="Verbose output")
 ) -> None:
     """Run the MCP server with stdio transport."""
     mcp.run(transport="stdio")
 
 @app.command("sse")
-def cli_app_sse(
-    host: str = typer.Option(DEFAULT_HOST, "--host", help="Host to bind to"),
-    port: int = typer.Option(DEFAULT_PORT, "--port", help="Port to bind to")
+def sse_command(
+    host: str = typer.Option(SETTINGS.mcp_host, "--host", help="Host to bind to"),
+    port: int = typer.Option(SETTINGS.mcp_port, "--port", help="Port to bind to")
 ) -> None:
     """Run the MCP server with SSE transport."""
     mcp.run(transport="sse", host=host, port=port)
@@ -407,7 +527,7 @@ def cli_app_sse(
 # Standalone CLI functions for direct script access
 def cli_app_run() -> None:
     """Standalone function for cell2sentence4longevity-mcp-run script."""
-    mcp.run(transport="streamable-http", host=DEFAULT_HOST, port=DEFAULT_PORT)
+    mcp.run(transport=SETTINGS.mcp_transport, host=SETTINGS.mcp_host, port=SETTINGS.mcp_port)
 
 def cli_app_stdio() -> None:
     """Standalone function for cell2sentence4longevity-mcp-stdio script."""
@@ -415,8 +535,7 @@ def cli_app_stdio() -> None:
 
 def cli_app_sse() -> None:
     """Standalone function for cell2sentence4longevity-mcp-sse script."""
-    mcp.run(transport="sse", host=DEFAULT_HOST, port=DEFAULT_PORT)
+    mcp.run(transport="sse", host=SETTINGS.mcp_host, port=SETTINGS.mcp_port)
 
 if __name__ == "__main__":
     app()
-
@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+"""Shared HTTP plumbing for talking to the vLLM completions API."""
+
+import asyncio
+import os
+import threading
+from functools import lru_cache
+from typing import Any, Awaitable, Callable, Coroutine, Dict, List, Optional, Set, Tuple, TypeVar, Union
+
+import httpx
+
+# httpx connections belong to the event loop that opened them, so async clients are pooled per loop.
+# Clients reference their loop, so entries are dropped by `prune_closed_loops` once the loop is closed
+_ASYNC_CLIENTS: Dict[asyncio.AbstractEventLoop, httpx.AsyncClient] = {}
+
+# Callers post orjson-serialized bytes (see knockout.py), so the content type is set explicitly
+JSON_HEADERS = {"Content-Type": "application/json"}
+
+T = TypeVar("T")
+
+# Event loop (on a daemon thread) that serves every synchronous caller, see `run_sync`
+_SYNC_LOOP: Optional[asyncio.AbstractEventLoop] = None
+_SYNC_LOOP_LOCK = threading.Lock()
+
+# Set VLLM_CLIENT_TOKENIZE=1 to send token ids instead of prompt strings (needs the optional transformers package)
+CLIENT_TOKENIZE = os.getenv("VLLM_CLIENT_TOKENIZE") == "1"
+
+# Concurrent single-prompt requests arriving within this window are coalesced into one list prompt
+BATCH_MAX_SIZE = 32
+BATCH_MAX_WAIT_S = 0.01
+
+
+def prune_closed_loops(registry: Dict[asyncio.AbstractEventLoop, Any]) -> None:
+    """
+    Drop the entries of closed event loops from a per-loop registry.
+    
+    Per-loop state references its loop, so a weak-keyed registry would never release it.
+    Registries are pruned whenever a new loop registers, which keeps them bounded by the number
+    of live loops (e.g. one `asyncio.run` per script call, or one loop per test).
+    """
+    for loop in [loop for loop in registry if loop.is_closed()]:
+        del registry[loop]
+
+
+def get_async_client() -> httpx.AsyncClient:
+    """Return the pooled async client of the running event loop, creating it on first use."""
+    loop = asyncio.get_running_loop()
+    client = _ASYNC_CLIENTS.get(loop)
+    if client is None:
+        prune_closed_loops(_ASYNC_CLIENTS)
+        client = httpx.AsyncClient(
+            limits=httpx.Limits(max_connections=100, max_keepalive_connections=20),
+            timeout=60.0
+        )
+        _ASYNC_CLIENTS[loop] = client
+    return client
+
+
+def _background_loop() -> asyncio.AbstractEventLoop:
+    """Return the process-wide event loop that runs sync callers' requests, starting it on first use."""
+    global _SYNC_LOOP
+    with _SYNC_LOOP_LOCK:
+        if _SYNC_LOOP is None:
+            _SYNC_LOOP = asyncio.new_event_loop()
+            threading.Thread(target=_SYNC_LOOP.run_forever, name="vllm-client-loop", daemon=True).start()
+        return _SYNC_LOOP
+
+
+def run_sync(coroutine: Coroutine[Any, Any, T]) -> T:
+    """
+    Run an async vLLM call from synchronous code and wait for its result.
+    
+    All sync callers share one long-lived background loop, so its pooled httpx client keeps
+    connections alive across calls (e.g. a script knocking out genes in a loop) instead of
+    reconnecting for every call. This also works when the caller already runs an event loop.
+    """
+    return asyncio.run_coroutine_threadsafe(coroutine, _background_loop()).result()
+
+
+@lru_cache(maxsize=8)
+def completions_url(vllm_base_url: str) -> str:
+    """Resolve the completions endpoint for a vLLM base URL."""
+    return vllm_base_url.rstrip("/") + "/v1/completions"
+
+
+@lru_cache(maxsize=4)
+def get_tokenizer(model: str) -> Any:
+    """Load the model's tokenizer once per process (transformers is optional, imported only here)."""
+    from transformers import AutoTokenizer
+    return AutoTokenizer.from_pretrained(model)
+
+
+@lru_cache(maxsize=4096)
+def _token_ids(model: str, prompt: str) -> Tuple[int, ...]:
+    return tuple(get_tokenizer(model)(prompt).input_ids)
+
+
+def encode_prompt(model: str, prompt: str) -> Union[str, List[int]]:
+    """
+    Return the prompt as vLLM should receive it: token ids with VLLM_CLIENT_TOKENIZE=1, else the string.
+    
+    vLLM's completions endpoint accepts a list of token ids as the prompt and skips its own
+    tokenization for it, taking that work off the server's prefill path.
+    """
+    if not CLIENT_TOKENIZE:
+        return prompt
+    return list(_token_ids(model, prompt))
+
+
+class VLLMBatcher:
+    """
+    Coalesce prompts submitted concurrently on one event loop into list-prompt completions requests.
+    
+    An idle batcher sends the prompts already queued right away, so a lone request pays no wait.
+    While batches are in flight, a new batch collects prompts until `max_batch_size` is reached or
+    `max_wait` seconds pass since its first prompt, then `send` completes the whole batch while the
+    next one is being collected. A batcher must only be shared by requests with identical sampling
+    parameters.
+    """
+    
+    def __init__(
+        self,
+        send: Callable[[List[str]], Awaitable[List[str]]],
+        max_batch_size: int = BATCH_MAX_SIZE,
+        max_wait: float = BATCH_MAX_WAIT_S
+    ):
+        self._send = send
+        self._max_batch_size = max_batch_size
+        self._max_wait = max_wait
+        self._queue: "asyncio.Queue[Tuple[str, asyncio.Future[str]]]" = asyncio.Queue()
+        self._collector: Optional["asyncio.Task[None]"] = None
+        # Strong references keep in-flight dispatch tasks from being garbage collected
+        self._dispatches: "Set[asyncio.Task[None]]" = set()
+    
+    async def submit(self, prompt: str) -> str:
+        """Queue a prompt and wait for its completion text."""
+        future: "asyncio.Future[str]" = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait((prompt, future))
+        if self._collector is None or self._collector.done():
+            self._collector = asyncio.create_task(self._collect())
+        return await future
+    
+    async def _collect(self) -> None:
+        # Runs until the queue is drained; `submit` starts a new collector for the next prompt,
+        # so an idle batcher holds no pending task
+        loop = asyncio.get_running_loop()
+        while not self._queue.empty():
+            items = [self._queue.get_nowait()]
+            deadline = loop.time() + (self._max_wait if self._dispatches else 0.0)
+            while len(items) < self._max_batch_size:
+                if not self._queue.empty():
+                    items.append(self._queue.get_nowait())
+                    continue
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    items.append(await asyncio.wait_for(self._queue.get(), remaining))
+                except asyncio.TimeoutError:
+                    break
+            task = asyncio.create_task(self._dispatch(items))
+            self._dispatches.add(task)
+            task.add_done_callback(self._dispatches.discard)
+    
+    async def _dispatch(self, items: List[Tuple[str, "asyncio.Future[str]"]]) -> None:
+        try:
+            texts = await self._send([prompt for prompt, _ in items])
+        except Exception as error:
+            self._fail(items, error)
+            return
+        # Texts are matched to prompts by position, so a short or long response cannot be assigned
+        if len(texts) != len(items):
+            self._fail(items, ValueError(f"Expected {len(items)} completions, got {len(texts)}"))
+            return
+        for (_, future), text in zip(items, texts):
+            if not future.done():
+                future.set_result(text)
+    
+    @staticmethod
+    def _fail(items: List[Tuple[str, "asyncio.Future[str]"]], error: Exception) -> None:
+        for _, future in items:
+            if not future.done():
+                future.set_exception(error)
@@ -0,0 +1,18 @@
+"""Shared fixtures for the Cell2Sentence4Longevity MCP tests."""
+
+import pytest
+from cell2sentence4longevity_mcp.server import Cell2SentenceMCP
+from cell2sentence4longevity_mcp.vllm_client import run_sync
+
+
+@pytest.fixture(scope="session")
+def mcp() -> Cell2SentenceMCP:
+    """One MCP server for the whole session, warmed up so timed tests do not pay vLLM's cold start."""
+    server = Cell2SentenceMCP()
+    try:
+        # A single generated token is enough to open the connection and run vLLM's first prefill
+        run_sync(server.predict_age(gene_sentence="MT-CO1", max_tokens=1))
+    except Exception:
+        # Tests skip on their own when the vLLM endpoint is not reachable
+        pass
+    return server
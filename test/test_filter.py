@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+"""Test the OpenGenes first-gene filter on a small local parquet file."""
+
+import sys
+from pathlib import Path
+
+import polars as pl
+
+# filter.py lives in the project root
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from filter import count_parquet_rows, filter_cells_by_gene_symbols
+
+
+def _write_cells(path: Path) -> None:
+    pl.DataFrame({
+        "cell_sentence": ["FOXO3 MT-CO1 FTL", "MT-CO1 FOXO3", "SIRT1 EEF1A1", "APOE LST1", "FOXO3X HLA-B"],
+        "tissue": ["blood", "blood", "brain", "liver", "brain"],
+    }).write_parquet(path)
+
+
+def test_filter_cells_by_gene_symbols(tmp_path: Path):
+    """Test that only cells whose first gene is an OpenGenes symbol are written."""
+    input_path = tmp_path / "cells.parquet"
+    output_path = tmp_path / "filtered.parquet"
+    _write_cells(input_path)
+    
+    filtered_count = filter_cells_by_gene_symbols(input_path, output_path, {"FOXO3", "SIRT1"})
+    
+    assert filtered_count == 2
+    assert pl.read_parquet(output_path)["cell_sentence"].to_list() == ["FOXO3 MT-CO1 FTL", "SIRT1 EEF1A1"]
+
+
+def test_filter_cells_partitioned(tmp_path: Path):
+    """Test that a partitioned filter writes one hive directory per partition value."""
+    input_path = tmp_path / "cells.parquet"
+    output_path = tmp_path / "filtered"
+    _write_cells(input_path)
+    
+    filtered_count = filter_cells_by_gene_symbols(
+        input_path, output_path, {"FOXO3", "SIRT1", "APOE"}, partition_by=["tissue"]
+    )
+    
+    assert filtered_count == 3
+    assert sorted(path.name for path in output_path.iterdir()) == ["tissue=blood", "tissue=brain", "tissue=liver"]
+    assert count_parquet_rows(output_path) == 3
+    assert sorted(pl.read_parquet(output_path / "tissue=brain")["cell_sentence"].to_list()) == ["SIRT1 EEF1A1"]
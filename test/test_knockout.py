@@ -4,11 +4,13 @@
 import sys
 from pathlib import Path
 
+import pytest
+
 # Add src to path
 src_path = Path(__file__).parent.parent / "src"
 sys.path.insert(0, str(src_path))
 
-from cell2sentence4longevity_mcp.knockout import insilico_knockout
+from cell2sentence4longevity_mcp.knockout import asweep_insilico_knockout, batch_insilico_knockout, extract_age, insilico_knockout
 
 def test_knockout():
     """Test the insilico knockout function."""
@@ -70,10 +72,129 @@ def test_knockout():
     print(f"  Warning: {result2.warning}")
     assert result2.warning is not None, "Warning should be present when gene is not found"
     assert "not found" in result2.warning, "Warning should mention gene not found"
+    assert result2.delta_age == 0.0, "Knocking out a missing gene should not change the prediction"
+    assert result2.knockout_gene_sentence == gene_sentence, "Knockout sentence should be unchanged when gene is not found"
     print("✓ Warning test passed!")
     
     return result
 
+def test_batch_knockout():
+    """Test knocking out several genes with batched vLLM requests."""
+    
+    gene_sentence = "MT-CO1 FTL EEF1A1 HLA-B LST1"
+    gene_symbols = ["MT-CO1", "LST1", "NONEXISTENT"]
+    
+    print(f"Testing batch knockout of {gene_symbols} from gene sentence: {gene_sentence}")
+    
+    results = batch_insilico_knockout(
+        gene_symbols=gene_symbols,
+        gene_sentence=gene_sentence,
+        vllm_base_url="http://89.169.110.141:8000",
+        model="transhumanist-already-exists/C2S-Scale-Gemma-2-27B-age-prediction-fullft",
+        sex="female",
+        tissue="blood",
+        cell_type="CD14-low, CD16-positive monocyte",
+        batch_size=2
+    )
+    
+    for result in results:
+        print(f"  {result.gene_knocked_out}: {result.age_prediction} -> {result.age_prediction_with_knockout} (delta {result.delta_age})")
+    
+    # Assertions
+    assert [result.gene_knocked_out for result in results] == gene_symbols, "Results should follow the requested gene order"
+    assert len({result.age_prediction for result in results}) == 1, "All knockouts should share one baseline prediction"
+    assert results[0].knockout_gene_sentence == "FTL EEF1A1 HLA-B LST1"
+    assert results[1].knockout_gene_sentence == "MT-CO1 FTL EEF1A1 HLA-B"
+    assert all(result.warning is None for result in results[:2]), "Found genes should not have warnings"
+    assert results[2].warning is not None and "not found" in results[2].warning
+    assert results[2].delta_age == 0.0, "Knocking out a missing gene should not change the prediction"
+    
+    print("✓ Batch knockout test passed!")
+    
+    return results
+
+async def test_multi_gene_knockout_rejects_empty_symbol():
+    """Test that batch and sweep knockouts reject an empty gene symbol before calling vLLM."""
+    gene_sentence = "MT-CO1 FTL EEF1A1 HLA-B LST1"
+    
+    with pytest.raises(ValueError, match="Gene symbol is empty"):
+        batch_insilico_knockout(
+            gene_symbols=["MT-CO1", " "],
+            gene_sentence=gene_sentence,
+            vllm_base_url="http://89.169.110.141:8000",
+            model="transhumanist-already-exists/C2S-Scale-Gemma-2-27B-age-prediction-fullft"
+        )
+    with pytest.raises(ValueError, match="Gene symbol is empty"):
+        await asweep_insilico_knockout(
+            gene_sentence=gene_sentence,
+            vllm_base_url="http://89.169.110.141:8000",
+            model="transhumanist-already-exists/C2S-Scale-Gemma-2-27B-age-prediction-fullft",
+            gene_symbols=[""]
+        )
+
+async def test_knockouts_reject_multi_gene_symbol():
+    """Test that single, batch and sweep knockouts agree on rejecting a symbol that spans several genes."""
+    gene_sentence = "MT-CO1 FTL EEF1A1 HLA-B LST1"
+    
+    with pytest.raises(ValueError, match="single gene"):
+        insilico_knockout(
+            gene_symbol="HLA-B LST1",
+            gene_sentence=gene_sentence,
+            vllm_base_url="http://89.169.110.141:8000",
+            model="transhumanist-already-exists/C2S-Scale-Gemma-2-27B-age-prediction-fullft"
+        )
+    with pytest.raises(ValueError, match="single gene"):
+        batch_insilico_knockout(
+            gene_symbols=["MT-CO1", "HLA-B LST1"],
+            gene_sentence=gene_sentence,
+            vllm_base_url="http://89.169.110.141:8000",
+            model="transhumanist-already-exists/C2S-Scale-Gemma-2-27B-age-prediction-fullft"
+        )
+    with pytest.raises(ValueError, match="single gene"):
+        await asweep_insilico_knockout(
+            gene_sentence=gene_sentence,
+            vllm_base_url="http://89.169.110.141:8000",
+            model="transhumanist-already-exists/C2S-Scale-Gemma-2-27B-age-prediction-fullft",
+            gene_symbols=["HLA-B LST1"]
+        )
+
+def test_single_and_batch_knockout_agree():
+    """Test that single and batch knockouts agree on which genes are found and what is removed."""
+    gene_sentence = "MT-CO1 FTL EEF1A1 HLA-B LST1"
+    gene_symbols = ["HLA-B", "NONEXISTENT"]
+    
+    batch = batch_insilico_knockout(
+        gene_symbols=gene_symbols,
+        gene_sentence=gene_sentence,
+        vllm_base_url="http://89.169.110.141:8000",
+        model="transhumanist-already-exists/C2S-Scale-Gemma-2-27B-age-prediction-fullft"
+    )
+    for gene, batch_result in zip(gene_symbols, batch):
+        single_result = insilico_knockout(
+            gene_symbol=gene,
+            gene_sentence=gene_sentence,
+            vllm_base_url="http://89.169.110.141:8000",
+            model="transhumanist-already-exists/C2S-Scale-Gemma-2-27B-age-prediction-fullft"
+        )
+        assert single_result.gene_knocked_out == batch_result.gene_knocked_out
+        assert single_result.knockout_gene_sentence == batch_result.knockout_gene_sentence
+        assert single_result.warning == batch_result.warning
+    assert batch[1].delta_age == 0.0
+
+def test_extract_age():
+    """Test that age parsing takes the first number the way the age regex defines it."""
+    assert extract_age("42") == 42.0
+    assert extract_age(" 42.5 years") == 42.5
+    assert extract_age("42.") == 42.0
+    # Tokens float() accepts but the regex does not must not take the fast path
+    assert extract_age("1e3") == 1.0
+    assert extract_age("4_2") == 4.0
+    assert extract_age("inf 35") == 35.0
+    assert extract_age("unknown") is None
+
 if __name__ == "__main__":
     test_knockout()
+    test_batch_knockout()
+    test_single_and_batch_knockout_agree()
+    test_extract_age()
 
@@ -1,27 +1,34 @@
 """Test the Cell2Sentence4Longevity MCP server."""
 
+import asyncio
+import logging
+import os
+import time
+
+import httpx
 import pytest
 from cell2sentence4longevity_mcp.server import Cell2SentenceMCP, AgePredictionResult
-from cell2sentence4longevity_mcp.knockout import KnockoutResult
+from cell2sentence4longevity_mcp.knockout import KnockoutResult, clear_prediction_cache
+
+log = logging.getLogger(__name__)
 
+# Timing comparisons depend on the load of the shared vLLM server, so they only run with PERF_COMPARE=1
+PERF_COMPARE = os.getenv("PERF_COMPARE") == "1"
 
-def test_server_initialization():
+
+def test_server_initialization(mcp: Cell2SentenceMCP):
     """Test that the MCP server initializes correctly."""
-    mcp = Cell2SentenceMCP()
-    
     assert mcp is not None
     assert mcp.model == "transhumanist-already-exists/C2S-Scale-Gemma-2-27B-age-prediction-fullft"
     assert mcp.vllm_base_url == "http://89.169.110.141:8000"
 
 
-def test_predict_age():
+async def test_predict_age(mcp: Cell2SentenceMCP):
     """Test basic age prediction functionality."""
-    mcp = Cell2SentenceMCP()
-    
     gene_sentence = "MT-CO1 FTL EEF1A1 HLA-B LST1 S100A4 HLA-C H3-3B ZFP36 AIF1"
     
     try:
-        result = mcp.predict_age(gene_sentence=gene_sentence)
+        result = await mcp.predict_age(gene_sentence=gene_sentence)
         
         assert isinstance(result, AgePredictionResult)
         assert result.predicted_age is not None
@@ -36,14 +43,12 @@ def test_predict_age():
         pytest.skip(f"vLLM endpoint not available: {e}")
 
 
-def test_predict_age_with_metadata():
+async def test_predict_age_with_metadata(mcp: Cell2SentenceMCP):
     """Test age prediction with metadata."""
-    mcp = Cell2SentenceMCP()
-    
     gene_sentence = "MT-CO1 FTL EEF1A1 HLA-B LST1 S100A4 HLA-C H3-3B ZFP36 AIF1"
     
     try:
-        result = mcp.predict_age_with_metadata(
+        result = await mcp.predict_age_with_metadata(
             gene_sentence=gene_sentence,
             sex="female",
             smoking_status=0,
@@ -64,14 +69,12 @@ def test_predict_age_with_metadata():
         pytest.skip(f"vLLM endpoint not available: {e}")
 
 
-def test_custom_parameters():
+async def test_custom_parameters(mcp: Cell2SentenceMCP):
     """Test prediction with custom parameters."""
-    mcp = Cell2SentenceMCP()
-    
     gene_sentence = "TP53 FOXO3 SIRT1 APOE CDKN2A IGF1R"
     
     try:
-        result = mcp.predict_age(
+        result = await mcp.predict_age(
             gene_sentence=gene_sentence,
             max_tokens=30,
             temperature=0.1,
@@ -86,14 +89,46 @@ def test_custom_parameters():
         pytest.skip(f"vLLM endpoint not available: {e}")
 
 
-def test_insilico_knockout():
-    """Test insilico knockout functionality."""
-    mcp = Cell2SentenceMCP()
+async def test_predict_age_batch(mcp: Cell2SentenceMCP):
+    """Test batched age prediction, and with PERF_COMPARE=1 that its wall clock grows sublinearly with batch size."""
+    genes = "MT-CO1 FTL EEF1A1 HLA-B LST1 S100A4 HLA-C H3-3B ZFP36 AIF1".split()
+    # Rotated sentences give distinct prompts of the same length
+    gene_sentences = [" ".join(genes[i:] + genes[:i]) for i in range(8)]
+    
+    try:
+        start = time.perf_counter()
+        single = await mcp.predict_age_batch(gene_sentences=gene_sentences[:1])
+        single_elapsed = time.perf_counter() - start
+        
+        start = time.perf_counter()
+        results = await mcp.predict_age_batch(gene_sentences=gene_sentences)
+        batch_elapsed = time.perf_counter() - start
+    except Exception as e:
+        pytest.skip(f"vLLM endpoint not available: {e}")
     
+    assert len(single) == 1
+    assert len(results) == len(gene_sentences)
+    assert all(isinstance(result, AgePredictionResult) for result in results)
+    assert all(result.predicted_age is not None for result in results)
+    assert all(
+        f"cell sentence: {gene_sentence}\n" in result.prompt_used
+        for gene_sentence, result in zip(gene_sentences, results)
+    )
+    
+    log.info("Single sentence: %.2fs, batch of %d: %.2fs", single_elapsed, len(gene_sentences), batch_elapsed)
+    if PERF_COMPARE:
+        assert batch_elapsed < len(gene_sentences) * single_elapsed, (
+            f"Batch of {len(gene_sentences)} took {batch_elapsed:.2f}s, a single sentence {single_elapsed:.2f}s"
+        )
+
+
+async def test_insilico_knockout(mcp: Cell2SentenceMCP):
+    """Test insilico knockout functionality."""
     gene_sentence = "MT-CO1 FTL EEF1A1 HLA-B LST1"
     
     try:
-        result = mcp.insilico_knockout_tool(
+        result = await mcp.insilico_knockout_tool(
+            gene_symbol="MT-CO1",
             gene_sentence=gene_sentence,
             sex="female",
             tissue="blood",
@@ -116,31 +151,106 @@ def test_insilico_knockout():
         pytest.skip(f"vLLM endpoint not available: {e}")
 
 
+
+async def test_insilico_knockout_batch(mcp: Cell2SentenceMCP):
+    """Test batched insilico knockout of several genes."""
+    gene_sentence = "MT-CO1 FTL EEF1A1 HLA-B LST1"
+    gene_symbols = ["MT-CO1", "HLA-B", "NONEXISTENT"]
+    
+    try:
+        results = await mcp.insilico_knockout_batch_tool(
+            gene_symbols=gene_symbols,
+            gene_sentence=gene_sentence,
+            sex="female",
+            tissue="blood",
+            cell_type="CD14-low, CD16-positive monocyte"
+        )
+    except httpx.HTTPError as e:
+        pytest.skip(f"vLLM endpoint not available: {e}")
+    
+    assert [result.gene_knocked_out for result in results] == gene_symbols
+    assert all(isinstance(result, KnockoutResult) for result in results)
+    assert results[0].knockout_gene_sentence == "FTL EEF1A1 HLA-B LST1"
+    assert results[1].knockout_gene_sentence == "MT-CO1 FTL EEF1A1 LST1"
+    assert results[2].warning is not None
+    assert results[2].delta_age == 0.0
+    
+    for result in results:
+        print(f"✓ {result.gene_knocked_out}: delta {result.delta_age} years")
+
+
+
+async def test_insilico_knockout_sweep(mcp: Cell2SentenceMCP):
+    """Test that a concurrent knockout sweep returns one consistent result per gene, in sentence order."""
+    gene_sentence = "MT-CO1 FTL EEF1A1 HLA-B LST1"
+    
+    try:
+        # Clear cached predictions before each run so both are timed against vLLM
+        clear_prediction_cache()
+        start = time.perf_counter()
+        results = await mcp.insilico_knockout_sweep_tool(gene_sentence=gene_sentence)
+        sweep_elapsed = time.perf_counter() - start
+        
+        if PERF_COMPARE:
+            clear_prediction_cache()
+            start = time.perf_counter()
+            for gene in gene_sentence.split():
+                await mcp.insilico_knockout_tool(gene_symbol=gene, gene_sentence=gene_sentence, temperature=0.0)
+            serial_elapsed = time.perf_counter() - start
+    except httpx.HTTPError as e:
+        pytest.skip(f"vLLM endpoint not available: {e}")
+    
+    assert [result.gene_knocked_out for result in results] == gene_sentence.split()
+    for result in results:
+        assert result.age_prediction is not None
+        assert result.age_prediction_with_knockout is not None
+        assert result.delta_age == result.age_prediction_with_knockout - result.age_prediction
+    
+    log.info("Concurrent sweep: %.2fs", sweep_elapsed)
+    if PERF_COMPARE:
+        log.info("Serial knockouts: %.2fs", serial_elapsed)
+        assert sweep_elapsed <= serial_elapsed, f"Sweep took {sweep_elapsed:.2f}s, serial knockouts {serial_elapsed:.2f}s"
+
+
 if __name__ == "__main__":
     # Run tests directly
     print("Running Cell2Sentence4Longevity MCP Tests")
     print("=" * 60)
     
+    mcp = Cell2SentenceMCP()
+    
     print("\n1. Testing server initialization...")
-    test_server_initialization()
+    test_server_initialization(mcp)
     print("   ✓ Server initialization test passed")
     
     print("\n2. Testing basic age prediction...")
-    test_predict_age()
+    asyncio.run(test_predict_age(mcp))
     print("   ✓ Basic age prediction test passed")
     
     print("\n3. Testing age prediction with metadata...")
-    test_predict_age_with_metadata()
+    asyncio.run(test_predict_age_with_metadata(mcp))
     print("   ✓ Age prediction with metadata test passed")
     
     print("\n4. Testing custom parameters...")
-    test_custom_parameters()
+    asyncio.run(test_custom_parameters(mcp))
     print("   ✓ Custom parameters test passed")
     
     print("\n5. Testing insilico knockout...")
-    test_insilico_knockout()
+    asyncio.run(test_insilico_knockout(mcp))
     print("   ✓ Insilico knockout test passed")
     
+    print("\n6. Testing batched insilico knockout...")
+    asyncio.run(test_insilico_knockout_batch(mcp))
+    print("   ✓ Batched insilico knockout test passed")
+    
+    print("\n7. Testing insilico knockout sweep...")
+    asyncio.run(test_insilico_knockout_sweep(mcp))
+    print("   ✓ Insilico knockout sweep test passed")
+    
+    print("\n8. Testing batched age prediction...")
+    asyncio.run(test_predict_age_batch(mcp))
+    print("   ✓ Batched age prediction test passed")
+    
     print("\n" + "=" * 60)
     print("All tests passed!")
 
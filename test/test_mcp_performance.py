@@ -1,9 +1,14 @@
 #!/usr/bin/env python3
 """Test MCP server performance to ensure logging doesn't cause delays."""
 
+import logging
+import os
 import time
 from pathlib import Path
 
+log = logging.getLogger(__name__)
+
+
 def test_mcp_server_logging_configured():
     """Test that MCP server sets up logging properly."""
     # Import the server module - this should trigger logging setup
@@ -23,38 +28,42 @@ def test_mcp_server_logging_configured():
     print("✓ MCP server logging is properly configured")
 
 
-def test_knockout_performance():
+def test_knockout_performance(mcp):
     """Test that knockout function performs quickly (basic sanity check)."""
-    from cell2sentence4longevity_mcp.knockout import insilico_knockout
+    from cell2sentence4longevity_mcp.knockout import clear_prediction_cache, insilico_knockout
     
     # Simple test with a few genes
     gene_sentence = "MT-CO1 FTL EEF1A1 HLA-B LST1"
     gene_symbol = "MT-CO1"
     
-    start_time = time.time()
+    # The mcp fixture has already warmed up vLLM, so only steady-state latency is timed.
+    # Other tests predict the same prompts, so clear cached predictions to time vLLM, not a dict lookup
+    clear_prediction_cache()
+    start_time = time.perf_counter()
     
     result = insilico_knockout(
         gene_symbol=gene_symbol,
         gene_sentence=gene_sentence,
-        vllm_base_url="http://89.169.110.141:8000",
-        model="transhumanist-already-exists/C2S-Scale-Gemma-2-27B-age-prediction-fullft",
+        vllm_base_url=mcp.vllm_base_url,
+        model=mcp.model,
         sex="female",
         tissue="blood",
         cell_type="CD14-low, CD16-positive monocyte"
     )
     
-    elapsed = time.time() - start_time
+    elapsed = time.perf_counter() - start_time
     
-    # Should complete in reasonable time (< 5 seconds for 2 API calls)
-    # This is a sanity check - actual performance depends on vLLM server
-    print(f"✓ Knockout completed in {elapsed:.2f} seconds")
-    print(f"  Original age: {result.age_prediction}")
-    print(f"  Knockout age: {result.age_prediction_with_knockout}")
-    print(f"  Delta: {result.delta_age}")
+    # Both predictions are submitted concurrently; PERF_THRESHOLD_S can be tuned to the vLLM server in use
+    log.debug("Knockout completed in %.2f seconds", elapsed)
+    log.debug("Original age: %s", result.age_prediction)
+    log.debug("Knockout age: %s", result.age_prediction_with_knockout)
+    log.debug("Delta: %s", result.delta_age)
     
     assert result.gene_knocked_out == gene_symbol
     assert result.age_prediction is not None
     assert result.age_prediction_with_knockout is not None
+    threshold = float(os.getenv("PERF_THRESHOLD_S", "10"))
+    assert elapsed < threshold, f"Knockout took {elapsed:.2f}s, threshold is {threshold:.2f}s"
 
 
 if __name__ == "__main__":
@@ -62,7 +71,8 @@ if __name__ == "__main__":
     test_mcp_server_logging_configured()
     
     print("\nTesting knockout performance...")
-    test_knockout_performance()
+    from cell2sentence4longevity_mcp.server import Cell2SentenceMCP
+    test_knockout_performance(Cell2SentenceMCP())
     
     print("\n✓ All performance tests passed!")
 
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""Test the micro-batcher that coalesces concurrent vLLM prompts."""
+
+import asyncio
+from typing import List
+
+import pytest
+from cell2sentence4longevity_mcp.vllm_client import VLLMBatcher, prune_closed_loops
+
+
+async def test_batcher_coalesces_concurrent_prompts():
+    """Test that concurrent prompts are sent as one batch and each caller gets its own text."""
+    batches: List[List[str]] = []
+    
+    async def send(prompts: List[str]) -> List[str]:
+        batches.append(prompts)
+        return [f"{prompt}-done" for prompt in prompts]
+    
+    batcher = VLLMBatcher(send, max_wait=0.05)
+    texts = await asyncio.gather(*[batcher.submit(f"p{i}") for i in range(5)])
+    
+    assert texts == [f"p{i}-done" for i in range(5)]
+    assert batches == [[f"p{i}" for i in range(5)]]
+
+
+async def test_batcher_sends_lone_prompt_without_waiting():
+    """Test that an idle batcher dispatches a lone prompt right away instead of waiting for the batch window."""
+    async def send(prompts: List[str]) -> List[str]:
+        return [f"{prompt}-done" for prompt in prompts]
+    
+    batcher = VLLMBatcher(send, max_wait=60)
+    
+    assert await asyncio.wait_for(batcher.submit("p0"), timeout=5) == "p0-done"
+
+
+async def test_batcher_collects_prompts_while_a_batch_is_in_flight():
+    """Test that prompts arriving during an in-flight batch are coalesced into the next one."""
+    batches: List[List[str]] = []
+    release = asyncio.Event()
+    
+    async def send(prompts: List[str]) -> List[str]:
+        batches.append(prompts)
+        await release.wait()
+        return [f"{prompt}-done" for prompt in prompts]
+    
+    batcher = VLLMBatcher(send, max_wait=0.05)
+    first = asyncio.create_task(batcher.submit("p0"))
+    await asyncio.sleep(0)
+    rest = [asyncio.create_task(batcher.submit(f"p{i}")) for i in range(1, 4)]
+    await asyncio.sleep(0.1)
+    release.set()
+    
+    assert await asyncio.gather(first, *rest) == [f"p{i}-done" for i in range(4)]
+    assert batches == [["p0"], ["p1", "p2", "p3"]]
+
+
+def test_prune_closed_loops():
+    """Test that per-loop registries drop closed loops and keep open ones."""
+    open_loop = asyncio.new_event_loop()
+    closed_loop = asyncio.new_event_loop()
+    closed_loop.close()
+    registry = {open_loop: "open", closed_loop: "closed"}
+    
+    prune_closed_loops(registry)
+    open_loop.close()
+    
+    assert registry == {open_loop: "open"}
+
+
+async def test_batcher_fails_every_prompt_on_short_response():
+    """Test that a response with fewer texts than prompts fails all callers instead of leaving some waiting."""
+    async def send(prompts: List[str]) -> List[str]:
+        return ["42"]
+    
+    batcher = VLLMBatcher(send, max_wait=0.05)
+    results = await asyncio.wait_for(
+        asyncio.gather(*[batcher.submit(f"p{i}") for i in range(3)], return_exceptions=True),
+        timeout=5
+    )
+    
+    assert all(isinstance(result, ValueError) for result in results)
+
+
+async def test_batcher_propagates_send_errors():
+    """Test that a failed send raises in every caller of the batch."""
+    async def send(prompts: List[str]) -> List[str]:
+        raise ConnectionError("vLLM unavailable")
+    
+    batcher = VLLMBatcher(send, max_wait=0.05)
+    with pytest.raises(ConnectionError):
+        await batcher.submit("p0")